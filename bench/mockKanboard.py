@@ -0,0 +1,270 @@
+"""
+Local stand-in for Kanboard's /jsonrpc.php, for benchmarks.
+
+Generates synthetic projects, categories and tasks of configurable size
+and answers JSON-RPC calls (single and batch) over keep-alive HTTP/1.1,
+optionally adding a fixed latency to every request and gzip compressing
+responses for clients that accept it (gzip request bodies are always
+inflated). Only the methods the
+client uses are implemented; anything else gets "Method not found".
+
+  python bench/mockKanboard.py --port 8080 --projects 5 --tasks 5000 --latency 0.02
+
+or in-process:
+
+  server = MockKanboard(tasks=1000).start()
+  ... KB_SITE = server.site ...
+  server.stop()
+"""
+import argparse
+import datetime
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EPOCH = 1700000000
+
+# Board columns every task sits in, by column_id
+COLUMNS = {"1": "Backlog", "2": "Ready", "3": "Work in progress", "4": "Done"}
+
+DATE_FIELDS = {"created": "date_creation", "modified": "date_modification", "updated": "date_modification",
+               "due": "date_due"}
+
+
+class UnknownMethod(Exception):
+    pass
+
+
+class Board:
+    # The synthetic data set; every method is guarded by one lock
+    def __init__(self, projects=3, categories=20, tasks=1000, closed=0.2, links=0):
+        self.lock = threading.Lock()
+        self.projects = [
+            {"id": str(p), "name": f"Project {p}", "identifier": f"P{p}", "description": "",
+             "is_active": "1", "is_public": "0", "is_private": "0", "owner_id": "1", "last_modified": str(EPOCH)}
+            for p in range(1, projects + 1)
+        ]
+        self.categories = {}
+        self.tasks = {}
+        self.links = {}
+        self.tags = {}
+        self.next_id = 1
+        for project in self.projects:
+            project_id = int(project["id"])
+            self.categories[project_id] = [
+                {"id": str(self._newId()), "name": f"Category {c}", "project_id": str(project_id),
+                 "description": "", "color_id": ""}
+                for c in range(categories)
+            ]
+            for t in range(tasks):
+                category_id = self.categories[project_id][t % categories]["id"] if categories else "0"
+                task = self._task(project_id, f"Task {t}", category_id)
+                task["date_modification"] = str(EPOCH + t)
+                task["column_id"] = str(t % len(COLUMNS) + 1)
+                task["is_active"] = "0" if t < tasks * closed else "1"
+                self.tasks[int(task["id"])] = task
+                for l in range(links):
+                    self._link(task["id"], f"https://example.com/{t}/{l}", f"Link {l}")
+
+    def _newId(self):
+        self.next_id += 1
+        return self.next_id - 1
+
+    def _task(self, project_id, title, category_id="0", description=""):
+        return {
+            "id": str(self._newId()), "title": title, "description": description, "project_id": str(project_id),
+            "column_id": "1", "swimlane_id": "1", "owner_id": "0", "creator_id": "1", "category_id": str(category_id),
+            "color_id": "yellow", "priority": "0", "score": "0", "position": "1", "reference": "",
+            "is_active": "1", "date_creation": str(EPOCH), "date_modification": str(EPOCH),
+            "date_moved": str(EPOCH), "date_due": "0", "date_completed": None, "date_started": "0",
+            "recurrence_status": "0", "recurrence_trigger": "0", "recurrence_factor": "0",
+            "recurrence_timeframe": "0", "recurrence_basedate": "0", "recurrence_parent": None,
+            "recurrence_child": None, "time_estimated": "0", "time_spent": "0",
+        }
+
+    def _link(self, task_id, url, title):
+        link = {"id": str(self._newId()), "task_id": str(task_id), "url": url, "title": title,
+                "link_type": "weblink", "dependency": "related"}
+        self.links[int(link["id"])] = link
+        return link
+
+    def _search(self, project_id, query):
+        # Subset of Kanboard's filter syntax: title:, status:, category:, tag:,
+        # column: and created:/modified:/due: with >= > <= < and a date.
+        # Rows carry category_name and column_name like Kanboard's.
+        tasks = [t for t in self.tasks.values() if t["project_id"] == str(project_id)]
+        categories = {c["id"]: c["name"] for c in self.categories.get(int(project_id), [])}
+        for term in _terms(query):
+            key, _, value = term.partition(":")
+            if key == "title":
+                tasks = [t for t in tasks if value.lower() in t["title"].lower()]
+            elif key == "status":
+                active = "1" if value == "open" else "0"
+                tasks = [t for t in tasks if t["is_active"] == active]
+            elif key == "category":
+                tasks = [t for t in tasks if categories.get(t["category_id"], "").lower() == value.lower()]
+            elif key == "tag":
+                tasks = [t for t in tasks if value.lower() in (n.lower() for n in self.tags.get(int(t["id"]), []))]
+            elif key == "column":
+                tasks = [t for t in tasks if COLUMNS.get(t["column_id"], "").lower() == value.lower()]
+            elif key in DATE_FIELDS:
+                operator = next((op for op in (">=", "<=", ">", "<") if value.startswith(op)), "")
+                day = datetime.datetime.strptime(value[len(operator):], "%Y-%m-%d").replace(tzinfo=datetime.timezone.utc)
+                start, end = day.timestamp(), day.timestamp() + 86400
+                field = DATE_FIELDS[key]
+                check = {">=": lambda v: v >= start, ">": lambda v: v >= end, "<=": lambda v: v < end,
+                         "<": lambda v: v < start, "": lambda v: start <= v < end}[operator]
+                tasks = [t for t in tasks if int(t[field] or 0) > 0 and check(int(t[field] or 0))]
+            elif term:
+                tasks = [t for t in tasks if term.lower() in t["title"].lower()]
+        return [dict(t, category_name=categories.get(t["category_id"]), column_name=COLUMNS.get(t["column_id"]))
+                for t in tasks]
+
+    def call(self, method, params):
+        params = params or {}
+        with self.lock:
+            if method == "getAllProjects":
+                return self.projects
+            if method == "getAllCategories":
+                return self.categories.get(int(params["project_id"]), [])
+            if method == "getCategory":
+                return next((c for cs in self.categories.values() for c in cs if c["id"] == str(params["category_id"])), None)
+            if method == "createCategory":
+                project_id = int(params["project_id"])
+                if any(c["name"] == params["name"] for c in self.categories.get(project_id, [])):
+                    return False
+                category = {"id": str(self._newId()), "name": params["name"], "project_id": str(project_id),
+                            "description": "", "color_id": ""}
+                self.categories.setdefault(project_id, []).append(category)
+                return int(category["id"])
+            if method == "getAllTasks":
+                project_id = str(params["project_id"])
+                status_id = str(params.get("status_id", 1))
+                return [t for t in self.tasks.values() if t["project_id"] == project_id and t["is_active"] == status_id]
+            if method == "searchTasks":
+                return self._search(params["project_id"], params.get("query", ""))
+            if method == "getTask":
+                return self.tasks.get(int(params["task_id"]))
+            if method == "createTask":
+                task = self._task(params["project_id"], params["title"], params.get("category_id") or 0,
+                                  params.get("description") or "")
+                self.tasks[int(task["id"])] = task
+                if params.get("tags"):
+                    self.tags[int(task["id"])] = list(params["tags"])
+                return int(task["id"])
+            if method == "getColumns":
+                return [{"id": column_id, "title": title, "position": column_id, "project_id": str(params["project_id"])}
+                        for column_id, title in COLUMNS.items()]
+            if method == "getTaskTags":
+                # Kanboard answers {tag_id: name}, PHP turns an empty one into []
+                names = self.tags.get(int(params["task_id"]), [])
+                return {str(i + 1): name for i, name in enumerate(names)} if names else []
+            if method == "removeTask":
+                self.tags.pop(int(params["task_id"]), None)
+                return self.tasks.pop(int(params["task_id"]), None) is not None
+            if method == "createExternalTaskLink":
+                return int(self._link(params["task_id"], params["url"], params.get("title") or params["url"])["id"])
+            if method == "updateExternalTaskLink":
+                link = self.links.get(int(params["link_id"]))
+                if link is None:
+                    return False
+                link["title"] = params.get("title", link["title"])
+                return True
+            if method == "getAllExternalTaskLinks":
+                return [l for l in self.links.values() if l["task_id"] == str(params["task_id"])]
+        raise UnknownMethod(method)
+
+
+def _terms(query):
+    # Split on spaces outside double quotes, dropping the quotes
+    terms, current, quoted = [], "", False
+    for char in query:
+        if char == '"':
+            quoted = not quoted
+        elif char == " " and not quoted:
+            terms.append(current)
+            current = ""
+        else:
+            current += char
+    return [term for term in terms + [current] if term]
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _answer(self, request):
+        try:
+            result = self.server.board.call(request.get("method"), request.get("params"))
+        except UnknownMethod:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32601, "message": "Method not found"}}
+        except (KeyError, TypeError, ValueError) as error:
+            return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": -32602, "message": f"Invalid params: {error}"}}
+        return {"jsonrpc": "2.0", "id": request.get("id"), "result": result}
+
+    def do_POST(self):
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.headers.get("Content-Encoding") == "gzip":
+            raw = zlib.decompress(raw, 16 + zlib.MAX_WBITS)
+        body = json.loads(raw)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        response = [self._answer(r) for r in body] if isinstance(body, list) else self._answer(body)
+        data = json.dumps(response).encode()
+        encoding = ""
+        if self.server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+            deflater = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            data = deflater.compress(data) + deflater.flush()
+            encoding = "Content-Encoding: gzip\r\n"
+        # Headers and body in one write, so Nagle/delayed ACK do not add 40ms
+        head = (
+            f"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n{encoding}"
+            f"Content-Length: {len(data)}\r\n\r\n"
+        ).encode()
+        self.wfile.write(head + data)
+
+    do_GET = do_POST
+
+
+class MockKanboard(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, compress=False, **sizes):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.board = Board(**sizes)
+        self.latency = latency
+        self.compress = compress
+        self.site = f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Kanboard JSON-RPC server")
+    parser.add_argument("--port", default=8080, help="0 picks a free port", type=int)
+    parser.add_argument("--projects", default=3, type=int)
+    parser.add_argument("--categories", default=20, help="Per project", type=int)
+    parser.add_argument("--tasks", default=1000, help="Per project", type=int)
+    parser.add_argument("--closed", default=0.2, help="Share of closed tasks", type=float)
+    parser.add_argument("--links", default=0, help="External links per task", type=int)
+    parser.add_argument("--latency", default=0.0, help="Seconds added to every request", type=float)
+    parser.add_argument("--compress", help="Gzip responses when the client accepts it", action="store_true")
+    args = parser.parse_args()
+    server = MockKanboard(args.port, args.latency, args.compress, projects=args.projects, categories=args.categories,
+                          tasks=args.tasks, closed=args.closed, links=args.links)
+    # The first line tells a parent process where to connect
+    print(server.site, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
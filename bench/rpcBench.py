@@ -0,0 +1,222 @@
+"""
+Client benchmarks against bench/mockKanboard.py.
+
+Starts the mock server in a child process with synthetic data, then times
+the newCompany.py wrappers in this process: getAllProjects, getAllTasks,
+getTaskByName (searchTasks, and from the loaded lookup cache),
+getCategoryByName (cold, with the lookup cache emptied before every run,
+and cached) and the gp onboarding flow end to end
+(category, task and titled link for --companies new companies per run).
+
+For every benchmark it prints throughput, p50/p99 latency per run and the
+peak traced memory of one extra run under tracemalloc. Results can be
+stored as a baseline (--save) that later runs are compared against, so
+each performance change can be checked on the same machine.
+
+  python bench/rpcBench.py --save                    # store bench/baseline.json
+  python bench/rpcBench.py                           # compare with it
+  python bench/rpcBench.py --tasks 20000 --latency 0.01 -r 50 --check
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH = os.path.dirname(os.path.realpath(__file__))
+SRC = os.path.join(os.path.dirname(BENCH), "src")
+BASELINE = os.path.join(BENCH, "baseline.json")
+
+# (field, label, True when higher is better)
+FIELDS = (
+    ("ops_per_sec", "ops/s", True),
+    ("p50_ms", "p50 ms", False),
+    ("p99_ms", "p99 ms", False),
+    ("peak_kb", "peak KB", False),
+)
+
+
+def percentile(values, share):
+    # Nearest rank, values need not be sorted
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+def startServer(args):
+    server = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH, "mockKanboard.py"), "--port", "0",
+         "--projects", str(args.projects), "--categories", str(args.categories),
+         "--tasks", str(args.tasks), "--latency", str(args.latency)] + (["--compress"] if args.compress else []),
+        stdout=subprocess.PIPE, text=True,
+    )
+    site = server.stdout.readline().strip()
+    if not site:
+        server.kill()
+        raise RuntimeError("mockKanboard.py did not start")
+    return server, site
+
+
+def loadClient(site, workdir):
+    # newCompany.py wants a .env in the working folder and reads KB_SITE
+    # and KB_TOKEN from the environment first
+    with open(os.path.join(workdir, ".env"), "w") as fp:
+        fp.write(f"KB_SITE={site}\nKB_TOKEN=benchmark\n")
+    os.environ.update(KB_SITE=site, KB_TOKEN="benchmark")
+    os.chdir(workdir)
+    sys.path.insert(0, SRC)
+    import newCompany
+    return newCompany
+
+
+def benchmarks(nc, args):
+    # name -> (setup, job, operations per run)
+    api = nc.APIConnector()
+    project_id = 1
+    last_task = f"Task {args.tasks - 1}"
+    last_category = f"Category {args.categories - 1}"
+    from onboarding import Company
+    runs = iter(range(10 ** 9))
+
+    def companies():
+        run = next(runs)
+        return [Company(f"Bench {run}-{i}", f"https://example.com/{run}/{i}") for i in range(args.companies)]
+
+    def gp():
+        project = nc.pickProject(nc.getAllProjects(api), project_id)
+        for company in nc.newOnboarding().run(int(project["id"]), companies()):
+            if company.error is not None:
+                raise company.error
+
+    def coldCache():
+        nc._cache.invalidate()
+
+    def warmTasks():
+        # getTaskByName(status="open") answers from the loaded project
+        nc._cache.index(nc.TASKS, project_id, lambda: nc.iterAllTasks(project_id))
+
+    return {
+        "getAllProjects": (None, lambda: nc.getAllProjects(api), 1),
+        "getAllTasks": (None, lambda: nc.getAllTasks(project_id), 1),
+        "getTaskByName": (coldCache, lambda: nc.getTaskByName(project_id, last_task), 1),
+        "getTaskByName-cached": (warmTasks, lambda: nc.getTaskByName(project_id, last_task, status="open"), 1),
+        "getCategoryByName": (coldCache, lambda: nc.getCategoryByName(project_id, last_category), 1),
+        "getCategoryByName-cached": (None, lambda: nc.getCategoryByName(project_id, last_category), 1),
+        "gp": (coldCache, gp, args.companies),
+    }
+
+
+def measure(setup, job, ops, runs):
+    # The wrappers print as they go, keep that out of the report
+    with contextlib.redirect_stdout(io.StringIO()):
+        if setup:
+            setup()
+        job()  # warm up connections and caches
+        times = []
+        for _ in range(runs):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            job()
+            times.append(time.perf_counter() - start)
+
+        if setup:
+            setup()
+        tracemalloc.start()
+        job()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return {
+        "runs": runs,
+        "ops_per_sec": round(ops * runs / sum(times), 2),
+        "p50_ms": round(percentile(times, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(times, 0.99) * 1000, 3),
+        "peak_kb": round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, tolerance):
+    # Prints the change against the baseline, returns the regressed benchmarks
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        changes = []
+        for field, label, higher_is_better in FIELDS:
+            if not before.get(field):
+                continue
+            change = (result[field] - before[field]) / before[field] * 100
+            worse = -change if higher_is_better else change
+            flag = " !" if worse > tolerance else ""
+            changes.append(f"{label} {change:+.1f}%{flag}")
+            if flag:
+                regressions.append(name)
+        print(f"  {name:<26} " + "  ".join(changes))
+    return sorted(set(regressions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Client benchmarks against a mock Kanboard")
+    parser.add_argument("-r", "--runs", default=20, help="Timed runs per benchmark", type=int)
+    parser.add_argument("-b", "--bench", action="append", help="Only run this benchmark, can be repeated", type=str)
+    parser.add_argument("--projects", default=3, type=int)
+    parser.add_argument("--categories", default=20, help="Per project", type=int)
+    parser.add_argument("--tasks", default=2000, help="Per project", type=int)
+    parser.add_argument("--latency", default=0.0, help="Seconds the mock server adds to every request", type=float)
+    parser.add_argument("--compress", help="Mock server gzips responses", action="store_true")
+    parser.add_argument("--companies", default=10, help="Companies onboarded per gp run", type=int)
+    parser.add_argument("--baseline", default=BASELINE, help="Baseline file to compare with / --save to", type=str)
+    parser.add_argument("--save", help="Store the results as the new baseline", action="store_true")
+    parser.add_argument("--output", help="Also write the results to this JSON file", type=str)
+    parser.add_argument("--tolerance", default=25.0, help="Percent change reported as a regression", type=float)
+    parser.add_argument("--check", help="Exit with status 1 on a regression", action="store_true")
+    args = parser.parse_args()
+
+    config = {name: getattr(args, name) for name in ("projects", "categories", "tasks", "latency", "compress", "companies")}
+    server, site = startServer(args)
+    cwd = os.getcwd()
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            nc = loadClient(site, workdir)
+            results = {}
+            print(f"{'benchmark':<26} {'ops/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'peak KB':>9}")
+            for name, (setup, job, ops) in benchmarks(nc, args).items():
+                if args.bench and name not in args.bench:
+                    continue
+                result = results[name] = measure(setup, job, ops, args.runs)
+                print(f"{name:<26} {result['ops_per_sec']:>10.1f} {result['p50_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['peak_kb']:>9.1f}")
+            os.chdir(cwd)
+    finally:
+        server.kill()
+        server.wait()
+
+    report = {"config": config, "python": sys.version.split()[0], "date": time.strftime("%Y-%m-%d %H:%M:%S"), "results": results}
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=2)
+
+    failed = False
+    if os.path.isfile(args.baseline) and not args.save:
+        with open(args.baseline) as fp:
+            baseline = json.load(fp)
+        print(f"Compared with {args.baseline} ({baseline.get('date')}):")
+        if baseline.get("config") != config:
+            print(f"  NOTE: baseline was run with {baseline.get('config')}")
+        regressions = compare(results, baseline.get("results", {}), args.tolerance)
+        if regressions:
+            print(f"  Regressed: {', '.join(regressions)}")
+            failed = args.check
+    if args.save:
+        with open(args.baseline, "w") as fp:
+            json.dump(report, fp, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
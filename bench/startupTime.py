@@ -0,0 +1,111 @@
+"""
+Startup time benchmark for the command-line entry points.
+
+Runs each script with `python -X importtime <script> -v` (which exits right
+after argument parsing, before any network call) and prints the median
+wall time plus the modules with the largest cumulative import time.
+
+It exits with status 1 when a module that only the GUI or a bulk code path
+needs is imported on the plain CLI path, or when the median wall time is
+above --budget, so it can guard against startup regressions in CI or cron
+hosts.
+
+  python bench/startupTime.py
+  python bench/startupTime.py -r 20 --budget 150 --top 15
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), "src")
+SCRIPTS = ["newCompany.py", "getAllProjects.py"]
+
+# Must not be imported before the code path that needs them runs
+LAZY_MODULES = [
+    "tkinter",
+    "numpy",
+    "dataclasses",
+    "logging",
+    "csv",
+    "concurrent.futures",
+    "asyncio",
+    "http.client",
+    "models",
+    "gui",
+    "onboarding",
+    "companyImport",
+]
+
+
+def parseImportTime(stderr):
+    # Lines look like "import time:  self [us] | cumulative | name"
+    imports = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        imports[name.strip()] = (int(self_us), int(cumulative_us))
+    return imports
+
+
+def runOnce(script, workdir, env):
+    start = time.perf_counter()
+    res = subprocess.run(
+        [sys.executable, "-X", "importtime", os.path.join(workdir, "src", script), "-v"],
+        cwd=workdir, env=env, capture_output=True, text=True,
+    )
+    elapsed = (time.perf_counter() - start) * 1000
+    if res.returncode != 0:
+        raise RuntimeError(f"{script} exited with {res.returncode}:\n{res.stdout}{res.stderr}")
+    return elapsed, parseImportTime(res.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI startup time benchmark")
+    parser.add_argument("-r", "--runs", default=10, help="Runs per script", type=int)
+    parser.add_argument("--budget", default=0, help="Fail when the median wall time is above this many ms, 0 disables", type=float)
+    parser.add_argument("--top", default=10, help="Slowest imports to show", type=int)
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as workdir:
+        # The scripts refuse to start without a .env (newCompany.py looks in
+        # the working folder, getAllProjects.py next to itself), so run a copy
+        shutil.copytree(SRC, os.path.join(workdir, "src"), ignore=shutil.ignore_patterns("__pycache__", ".env"))
+        for folder in (workdir, os.path.join(workdir, "src")):
+            with open(os.path.join(folder, ".env"), "w") as fp:
+                fp.write("KB_SITE=kanboard.invalid\nKB_TOKEN=benchmark\n")
+        env = dict(os.environ, KB_SITE="kanboard.invalid", KB_TOKEN="benchmark")
+
+        for script in SCRIPTS:
+            runOnce(script, workdir, env)  # warm the bytecode cache
+            times = []
+            for _ in range(args.runs):
+                elapsed, imports = runOnce(script, workdir, env)
+                times.append(elapsed)
+            median = statistics.median(times)
+            total_us = sum(self_us for self_us, cumulative_us in imports.values())
+
+            print(f"{script}: median {median:.1f} ms, min {min(times):.1f} ms, imports {total_us / 1000:.1f} ms ({len(imports)} modules)")
+            slowest = sorted(imports.items(), key=lambda item: item[1][1], reverse=True)[:args.top]
+            for name, (self_us, cumulative_us) in slowest:
+                print(f"  {cumulative_us / 1000:8.2f} ms  {name}")
+
+            eager = [name for name in LAZY_MODULES if name in imports]
+            if eager:
+                failed = True
+                print(f"  FAIL: imported on the CLI path: {', '.join(eager)}")
+            if args.budget and median > args.budget:
+                failed = True
+                print(f"  FAIL: median {median:.1f} ms is over the {args.budget:.0f} ms budget")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Columnar NumPy snapshot of project tasks for board-health reports.
+
+getAllTasks rows are read once (a generator such as iterAllTasks works, the
+row dicts are not kept) into one int64 array per column. Counts, filters
+and histograms are then vectorized NumPy operations instead of Python
+loops over task dicts.
+
+  snapshot = TaskColumns.fromRows(iterAllTasks(project_id))
+  snapshot.countBy("column_id")            # {column_id: tasks}
+  snapshot.filter(snapshot["owner_id"] == 0).countBy("category_id")
+  snapshot.overdueCount()
+"""
+from array import array
+import time
+
+import numpy as np
+
+COLUMNS = (
+    "id",
+    "project_id",
+    "column_id",
+    "swimlane_id",
+    "owner_id",
+    "category_id",
+    "priority",
+    "score",
+    "is_active",
+    "date_creation",
+    "date_modification",
+    "date_moved",
+    "date_due",
+    "date_completed",
+)
+
+# Upper bounds in days for ageHistogram
+AGE_BINS = (7, 30, 90, 365)
+
+DAY = 86400
+
+
+def _int(value):
+    if value is None or value == "":
+        return 0
+    return int(value)
+
+
+class TaskColumns:
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.size = len(arrays["id"])
+
+    @classmethod
+    def fromRows(cls, rows):
+        # One pass, appending to compact typed buffers, then wrap in NumPy
+        buffers = {name: array("q") for name in COLUMNS}
+        appenders = [(name, buffers[name].append) for name in COLUMNS]
+        for row in rows:
+            get = row.get
+            for name, append in appenders:
+                append(_int(get(name)))
+        return cls({name: np.frombuffer(buffers[name], dtype=np.int64) for name in COLUMNS})
+
+    @classmethod
+    def concat(cls, snapshots):
+        snapshots = list(snapshots)
+        if not snapshots:
+            return cls.fromRows([])
+        return cls({name: np.concatenate([s.arrays[name] for s in snapshots]) for name in COLUMNS})
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def filter(self, mask):
+        return TaskColumns({name: values[mask] for name, values in self.arrays.items()})
+
+    def splitBy(self, name):
+        # (key, TaskColumns) per distinct value, one sort instead of a
+        # filter pass per key
+        if not self.size:
+            return
+        order = np.argsort(self.arrays[name], kind="stable")
+        ordered = {column: values[order] for column, values in self.arrays.items()}
+        keys, starts = np.unique(ordered[name], return_index=True)
+        ends = list(starts[1:]) + [self.size]
+        for key, start, end in zip(keys.tolist(), starts.tolist(), ends):
+            yield key, TaskColumns({column: values[start:end] for column, values in ordered.items()})
+
+    def where(self, **equals):
+        # Boolean mask of the tasks whose columns equal all given values
+        mask = np.ones(self.size, dtype=bool)
+        for name, value in equals.items():
+            mask &= self.arrays[name] == value
+        return mask
+
+    def countBy(self, *names):
+        # {key: tasks}, key is a tuple when grouping by several columns
+        if not self.size:
+            return {}
+        if len(names) == 1:
+            keys, counts = np.unique(self.arrays[names[0]], return_counts=True)
+            return dict(zip(keys.tolist(), counts.tolist()))
+        stacked = np.stack([self.arrays[name] for name in names], axis=1)
+        keys, counts = np.unique(stacked, axis=0, return_counts=True)
+        return dict(zip(map(tuple, keys.tolist()), counts.tolist()))
+
+    def sumBy(self, key, value):
+        if not self.size:
+            return {}
+        keys, inverse = np.unique(self.arrays[key], return_inverse=True)
+        sums = np.bincount(inverse, weights=self.arrays[value], minlength=len(keys))
+        return dict(zip(keys.tolist(), sums.astype(np.int64).tolist()))
+
+    def tasksPerColumn(self):
+        return self.countBy("column_id")
+
+    def tasksPerOwner(self):
+        return self.countBy("owner_id")
+
+    def tasksPerCategory(self):
+        return self.countBy("category_id")
+
+    def ageDays(self, now=None, date="date_creation"):
+        now = time.time() if now is None else now
+        return (now - self.arrays[date]) / DAY
+
+    def ageHistogram(self, now=None, bins=AGE_BINS, date="date_creation"):
+        # [(label, tasks)] for ages up to each bin bound plus one open bin
+        counts = np.bincount(np.searchsorted(bins, self.ageDays(now, date), side="left"), minlength=len(bins) + 1)
+        labels = [f"<={bound}d" for bound in bins] + [f">{bins[-1]}d"]
+        return list(zip(labels, counts.tolist()))
+
+    def overdueMask(self, now=None):
+        now = time.time() if now is None else now
+        due = self.arrays["date_due"]
+        return (due > 0) & (due < now) & (self.arrays["is_active"] == 1)
+
+    def overdueCount(self, now=None):
+        return int(self.overdueMask(now).sum())
+
+
+def printReport(snapshot, project_names=None, now=None):
+    # Board-health summary per project
+    project_names = project_names or {}
+    for project_id, project in snapshot.splitBy("project_id"):
+        print(f"  Project {project_id} {project_names.get(project_id, '')}: {len(project)} tasks, {project.overdueCount(now)} overdue")
+        print("    Per column:   " + "  ".join(f"{k}:{v}" for k, v in sorted(project.tasksPerColumn().items())))
+        print("    Per owner:    " + "  ".join(f"{k}:{v}" for k, v in sorted(project.tasksPerOwner().items())))
+        print("    Per category: " + "  ".join(f"{k}:{v}" for k, v in sorted(project.tasksPerCategory().items())))
+        print("    Age:          " + "  ".join(f"{k}:{v}" for k, v in project.ageHistogram(now)))
@@ -0,0 +1,154 @@
+"""
+JSON-RPC transport shared by newCompany.py and getAllProjects.py.
+
+Every APIConnector uses one keep-alive pool (connectionPool.py), one rate
+and retry policy (rateLimit.py) and one Metrics (metrics.py), created on
+first use from the settings given to configure(). The scripts configure
+the environment defaults at import and again once their flags are parsed.
+"""
+import contextlib
+import json
+import os
+
+_settings = {
+    "site": None,
+    "token": None,
+    "pool_size": 4,
+    "timeout": 60.0,
+    "rate": 0.0,
+    "retries": 3,
+    "compress_min": 0,
+}
+
+
+def configure(**settings):
+    # Only takes effect for the pool and policy if no call was made yet
+    unknown = set(settings) - set(_settings)
+    if unknown:
+        raise TypeError(f"Unknown APIConnector settings: {', '.join(sorted(unknown))}")
+    _settings.update(settings)
+
+
+def currentSettings():
+    # A copy, configure(**settings) puts it back
+    return dict(_settings)
+
+
+def newPolicy(concurrency):
+    # Rate limit, retries and adaptive concurrency, see rateLimit.py
+    from rateLimit import RPCPolicy, parseMethods
+    return RPCPolicy(
+        rate=_settings["rate"] or None,
+        burst=float(os.getenv("KB_BURST") or 0) or None,
+        retries=_settings["retries"],
+        concurrency=concurrency,
+        methods=parseMethods(os.getenv("KB_METHOD_POLICY")),
+    )
+
+
+class APIConnector:
+    # One keep-alive pool and one rate/retry policy shared by every
+    # connector, created on first use
+    pool = None
+    policy = None
+    metrics = None
+
+    def __init__(self):
+        from compression import acceptEncoding
+        if APIConnector.pool is None:
+            from connectionPool import ConnectionPool
+            from metrics import Metrics
+            APIConnector.metrics = Metrics()
+            APIConnector.pool = ConnectionPool(_settings["site"], size=_settings["pool_size"], timeout=_settings["timeout"])
+            APIConnector.policy = newPolicy(_settings["pool_size"])
+        self.pool = APIConnector.pool
+        self.policy = APIConnector.policy
+        self.metrics = APIConnector.metrics
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": "Basic " + _settings["token"],
+            "Accept-Encoding": acceptEncoding(),
+        }
+
+    def _body(self, payload):
+        # (body, headers) to send, gzip compressed from compress_min bytes on
+        from compression import compressBody
+        body, extra = compressBody(payload, _settings["compress_min"])
+        return body, dict(self.headers, **extra)
+
+    def _send(self, payload, methods):
+        # One attempt, measured per method (metrics.py)
+        from rateLimit import checkStatus
+        from metrics import CountingReader
+        from compression import decodingReader
+        body, headers = self._body(payload)
+        with self.metrics.timer(methods, len(body)) as timer:
+            with self.pool.response("GET", self.pool.rpc_path, body, headers) as res:
+                timer.phases.update(res.timings)
+                timer.mark()
+                wire = CountingReader(res)
+                data = decodingReader(wire, res.getheader("Content-Encoding")).read()
+                timer.phase("read")
+            timer.received = wire.count
+            checkStatus(res.status, res.reason, res.getheader("Retry-After"))
+            response = json.loads(data)
+            timer.phase("decode")
+        return response
+
+    def post(self, payload, methods=None):
+        # Decoded response, throttled and retried per method (rateLimit.py)
+        from rateLimit import methodsOf
+        methods = methods or methodsOf(payload)
+        return self.policy.run(methods, lambda: self._send(payload, methods))
+
+    def rpc(self, payload, method=None):
+        from rateLimit import methodsOf
+        from rpcBatch import RPCError
+        methods = [method] if method else methodsOf(payload)
+        response = self.post(payload, methods)
+        if "error" in response or "result" not in response:
+            error = RPCError(methods[0], response.get("error") or {"message": "No result in response"})
+            self.metrics.countError(methods[0], error)
+            raise error
+        return response["result"]
+
+    def call(self, method, params=None):
+        request = {"jsonrpc": "2.0", "method": method, "id": 1}
+        if params is not None:
+            request["params"] = params
+        return self.rpc(json.dumps(request), method)
+
+    def _open(self, stack, payload, methods):
+        # (reader, wire, timer) of a streamed call, closed with `stack`
+        from rateLimit import checkStatus
+        from metrics import CountingReader
+        from compression import decodingReader
+        body, headers = self._body(payload)
+        with contextlib.ExitStack() as attempt:
+            timer = attempt.enter_context(self.metrics.timer(methods, len(body)))
+            res = attempt.enter_context(self.pool.response("GET", self.pool.rpc_path, body, headers))
+            timer.phases.update(res.timings)
+            timer.mark()
+            if res.status >= 400:
+                res.read()
+                checkStatus(res.status, res.reason, res.getheader("Retry-After"))
+            stack.push(attempt.pop_all())
+            wire = CountingReader(res)
+            return decodingReader(wire, res.getheader("Content-Encoding")), wire, timer
+
+    def stream(self, payload, method=""):
+        # Yield the result list item by item as it comes off the socket.
+        # Only opening the response is retried, never a half-read result.
+        from jsonStream import iterResult
+        from rateLimit import methodsOf
+        methods = [method] if method else methodsOf(payload)
+        with contextlib.ExitStack() as stack:
+            res, wire, timer = self.policy.run(methods, lambda: self._open(stack, payload, methods))
+            try:
+                yield from iterResult(res, method)
+            finally:
+                timer.received = wire.count
+                timer.phase("read")
+
+    def callback(self):
+        self.entry.delete(0, "end")  # tk.END
@@ -0,0 +1,377 @@
+"""
+Asyncio Kanboard client for bulk jobs.
+
+Mirrors the blocking wrappers in newCompany.py, but every call is a
+coroutine. At most `concurrency` calls are on the wire at once and they
+share a pool of keep-alive connections, so thousands of calls are bounded
+by server throughput instead of latency times N. With a `policy`
+(rateLimit.RPCPolicy) calls are also rate limited, retried and held back
+by its adaptive limit; with `metrics` (metrics.Metrics) every request is
+recorded (server, decode and total time; connect/tls are not split out
+and received bytes are counted after inflating).
+
+  async def purge(task_ids):
+      async with AsyncKanboardClient(KB_SITE, KB_TOKEN, concurrency=20) as kb:
+          return await kb.removeTasks(task_ids)
+
+  asyncio.run(purge([301, 302, 303]))
+"""
+import asyncio
+import json
+import ssl
+import time
+
+from compression import CHUNK_SIZE, acceptEncoding, compressBody, decoder
+from connectionPool import splitSite
+from metrics import Timer
+from rateLimit import checkStatus, isOverload, methodsOf
+from rpcBatch import RPCError, nextId
+
+# Raised when the server has closed a kept-alive socket behind our back
+STALE_ERRORS = (
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+class StaleConnection(ConnectionError):
+    # The request cannot have been processed: sending it failed or the
+    # socket closed before a status line came back
+    pass
+
+
+class AsyncConnection:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def close(self):
+        self.writer.close()
+
+    async def _readBody(self, headers):
+        # Compressed bodies are inflated chunk by chunk as they arrive
+        reader = self.reader
+        inflater = decoder(headers.get("content-encoding"))
+        chunks = []
+
+        def add(chunk):
+            chunks.append(inflater.decompress(chunk) if inflater is not None else chunk)
+
+        def body():
+            if inflater is not None:
+                chunks.append(inflater.flush())
+            return b"".join(chunks)
+
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    # Skip trailers up to the final empty line
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return body(), True
+                add(await reader.readexactly(size))
+                await reader.readexactly(2)
+        if "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining:
+                chunk = await reader.readexactly(min(remaining, CHUNK_SIZE))
+                remaining -= len(chunk)
+                add(chunk)
+            return body(), True
+        while True:
+            chunk = await reader.read(CHUNK_SIZE)
+            if not chunk:
+                return body(), False
+            add(chunk)
+
+    async def request(self, method, host, path, body, headers):
+        head = [f"{method} {path} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}"]
+        head += [f"{name}: {value}" for name, value in headers.items()]
+        try:
+            self.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await self.writer.drain()
+        except STALE_ERRORS as error:
+            raise StaleConnection(str(error)) from error
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise StaleConnection("Connection closed before the response")
+        status = int(status_line.split()[1])
+        res_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            res_headers[name.strip().lower()] = value.strip()
+
+        data, reusable = await self._readBody(res_headers)
+        if res_headers.get("connection", "").lower() == "close":
+            reusable = False
+        self.last_used = time.monotonic()
+        return status, data, reusable
+
+
+class AsyncConnectionPool:
+    def __init__(self, site, size=10, idle_timeout=60):
+        conn_class, self.host, self.base_path = splitSite(site)
+        self.rpc_path = self.base_path + "/jsonrpc.php"
+        self.use_ssl = conn_class.default_port == 443
+        hostname, _, port = self.host.rpartition(":")
+        if port.isdigit():
+            self.hostname, self.port = hostname, int(port)
+        else:
+            self.hostname, self.port = self.host, conn_class.default_port
+        self.size = max(1, int(size))
+        self.idle_timeout = idle_timeout
+        self._idle = []  # oldest first
+        self._slots = None
+
+    async def _connect(self):
+        context = ssl.create_default_context() if self.use_ssl else None
+        reader, writer = await asyncio.open_connection(self.hostname, self.port, ssl=context)
+        return AsyncConnection(reader, writer)
+
+    def _takeIdle(self):
+        now = time.monotonic()
+        while self._idle and now - self._idle[0].last_used > self.idle_timeout:
+            self._idle.pop(0).close()
+        return self._idle.pop() if self._idle else None
+
+    async def request(self, method, path, body, headers):
+        if self._slots is None:
+            # Created here so it belongs to the running event loop
+            self._slots = asyncio.Semaphore(self.size)
+        async with self._slots:
+            conn = self._takeIdle()
+            reused = conn is not None
+            if conn is None:
+                conn = await self._connect()
+            try:
+                try:
+                    status, data, reusable = await conn.request(method, self.host, path, body, headers)
+                except StaleConnection:
+                    if not reused:
+                        raise
+                    # Kept-alive socket was closed by the server, reconnect once.
+                    # Failures once the server answered are left to the retry
+                    # policy, which never sends a write twice.
+                    conn.close()
+                    conn = await self._connect()
+                    status, data, reusable = await conn.request(method, self.host, path, body, headers)
+            except BaseException:
+                conn.close()
+                raise
+            if reusable:
+                self._idle.append(conn)
+            else:
+                conn.close()
+            return status, data
+
+    async def close(self):
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class AsyncKanboardClient:
+    def __init__(self, site, token, concurrency=10, pool_size=None, idle_timeout=60, timeout=60, policy=None, metrics=None, compress_min=0):
+        self.pool = AsyncConnectionPool(site, pool_size or concurrency, idle_timeout)
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.policy = policy
+        self.metrics = metrics
+        self.compress_min = compress_min
+        self.headers = {
+            "Content-Type": "application/json",
+            "Authorization": "Basic " + token,
+            "Accept-Encoding": acceptEncoding(),
+        }
+        self._limit = None
+        self._adaptive = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        await self.pool.close()
+
+    async def _exchange(self, body, headers, timer):
+        async with self._limit:
+            timer.mark()
+            try:
+                status, data = await asyncio.wait_for(
+                    self.pool.request("POST", self.pool.rpc_path, body, headers),
+                    self.timeout,
+                )
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"No answer within {self.timeout}s") from None
+            timer.phase("server")
+        timer.received = len(data)
+        checkStatus(status)
+        response = json.loads(data)
+        timer.phase("decode")
+        return response
+
+    async def _send(self, payload, methods):
+        body, extra = compressBody(payload.encode(), self.compress_min)
+        headers = dict(self.headers, **extra)
+        if self.metrics is None:
+            return await self._exchange(body, headers, Timer(None, methods, len(body)))
+        with self.metrics.timer(methods, len(body)) as timer:
+            return await self._exchange(body, headers, timer)
+
+    async def _release(self, start, error=None):
+        self.policy.limit.release(time.monotonic() - start, error is not None and isOverload(error))
+        async with self._adaptive:
+            self._adaptive.notify_all()
+
+    async def post(self, payload, methods=None):
+        if self._limit is None:
+            self._limit = asyncio.Semaphore(self.concurrency)
+            self._adaptive = asyncio.Condition()
+        methods = methods or methodsOf(payload)
+        if self.policy is None:
+            return await self._send(payload, methods)
+        attempt = 0
+        while True:
+            wait = self.policy.waits(methods)
+            if wait:
+                await asyncio.sleep(wait)
+            if self.policy.limit is not None:
+                async with self._adaptive:
+                    await self._adaptive.wait_for(self.policy.limit.tryAcquire)
+            start = time.monotonic()
+            try:
+                response = await self._send(payload, methods)
+            except Exception as error:
+                if self.policy.limit is not None:
+                    await self._release(start, error)
+                delay = self.policy.retryDelay(methods, error, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            if self.policy.limit is not None:
+                await self._release(start)
+            return response
+
+    async def call(self, method, params=None):
+        req = {"jsonrpc": "2.0", "method": method, "id": nextId()}
+        if params is not None:
+            req["params"] = params
+        response = await self.post(json.dumps(req), [method])
+        if "error" in response or "result" not in response:
+            error = RPCError(method, response.get("error") or {"message": "No result in response"})
+            if self.metrics is not None:
+                self.metrics.countError(method, error)
+            raise error
+        return response["result"]
+
+    async def gather(self, calls, return_exceptions=True):
+        # calls: iterable of (method, params). Results come back in order;
+        # failed calls hold their RPCError unless return_exceptions is False
+        return await asyncio.gather(
+            *(self.call(method, params) for method, params in calls),
+            return_exceptions=return_exceptions,
+        )
+
+    # Wrappers, same names and arguments as the blocking versions
+    async def getAllProjects(self):
+        return await self.call("getAllProjects")
+
+    async def createCategory(self, project_id, name):
+        return await self.call("createCategory", {"project_id": project_id, "name": name})
+
+    async def getCategory(self, project_id, category_id):
+        return await self.call("getCategory", {"project_id": project_id, "category_id": category_id})
+
+    async def getAllCategories(self, project_id):
+        return await self.call("getAllCategories", {"project_id": project_id})
+
+    async def getCategoryByName(self, project_id, category_name):
+        for category in await self.getAllCategories(project_id):
+            if category["name"] == category_name:
+                return category
+        return None
+
+    async def createTask(self, task):
+        return await self.call("createTask", task.params())
+
+    async def getAllTasks(self, project_id=1, status_id=1):
+        return await self.call("getAllTasks", {"project_id": project_id, "status_id": status_id})
+
+    async def searchTasks(self, project_id, query):
+        return await self.call("searchTasks", {"project_id": project_id, "query": query})
+
+    async def queryTasks(self, project_id, query):
+        # A taskQuery.TaskQuery, filtered by Kanboard where it can be and checked here
+        categories = columns = None
+        if query.category is not None:
+            categories = {c["name"]: c["id"] for c in await self.getAllCategories(project_id) or []}
+        if query.column is not None:
+            columns = {c["title"]: c["id"] for c in await self.call("getColumns", {"project_id": project_id}) or []}
+        matches = query.matcher(categories, columns)
+        search = query.search()
+        if search:
+            tasks = await self.searchTasks(project_id, search)
+        else:
+            tasks = [task for status_id in query.statusIds() for task in await self.getAllTasks(project_id, status_id)]
+        tasks = [task for task in tasks if matches(task)]
+        if query.tag is None or not tasks:
+            return tasks
+        tag_maps = await asyncio.gather(*(self.call("getTaskTags", {"task_id": int(task["id"])}) for task in tasks))
+        # PHP sends an empty tag map as []
+        tags = {int(task["id"]): list(tag_map.values()) if isinstance(tag_map, dict) else []
+                for task, tag_map in zip(tasks, tag_maps)}
+        return query.tagged(tasks, tags)
+
+    async def getTaskByName(self, project_id, task_name, status="all"):
+        from taskQuery import TaskQuery
+        return await self.queryTasks(project_id, TaskQuery(title=task_name, status=status))
+
+    async def remoteTask(self, task_id):
+        return await self.call("removeTask", {"task_id": task_id})
+
+    async def createExternalTaskLink(self, project_id, task_id, url, dependency, type, title):
+        return await self.call(
+            "createExternalTaskLink",
+            {
+                "project_id": project_id,
+                "task_id": task_id,
+                "url": url,
+                "dependency": dependency,
+                "link_type": type,
+                "title": title,
+            },
+        )
+
+    async def updateExternalTaskLink(self, project_id, task_id, link_id, title):
+        return await self.call(
+            "updateExternalTaskLink",
+            {"project_id": project_id, "task_id": task_id, "link_id": link_id, "title": title},
+        )
+
+    # Bulk helpers, results are keyed by the input and may hold an RPCError
+    async def getAllTasksForProjects(self, project_ids, status_id=1):
+        project_ids = list(project_ids)
+        results = await self.gather(
+            ("getAllTasks", {"project_id": project_id, "status_id": status_id})
+            for project_id in project_ids
+        )
+        return dict(zip(project_ids, results))
+
+    async def createTasks(self, tasks):
+        return await self.gather(("createTask", task.params()) for task in tasks)
+
+    async def removeTasks(self, task_ids):
+        task_ids = list(task_ids)
+        results = await self.gather(("removeTask", {"task_id": task_id}) for task_id in task_ids)
+        return dict(zip(task_ids, results))
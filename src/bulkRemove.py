@@ -0,0 +1,146 @@
+"""
+Bulk task removal: select from one fetch, show the plan, remove in batches.
+
+selectTasks() filters one pass over a project's tasks (a generator such as
+iterAllTasks works). All given criteria must match:
+
+  title       exact title, or a pattern with * and ? (case-insensitive)
+  category_id category id, resolve names with getCategoryByName first
+  tag         tag name; getAllTasks rows carry no tags, so the tags of the
+              remaining candidates are fetched once through `fetch_tags`
+  older_than  days since the task was last modified
+  duplicates  keep the oldest task of every title, select the others
+
+removeSelected() sends removeTask in batches of `batch_size`, `workers`
+batches at once, and appends every result to a journal file. Task ids the
+journal already has as removed are skipped, so a crashed run can simply be
+started again with the same journal.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import json
+import os
+import threading
+import time
+
+from taskQuery import titleMatcher
+
+DAY = 86400
+
+
+def _int(value):
+    if value is None or value == "":
+        return 0
+    return int(value)
+
+
+def selectTasks(tasks, title=None, category_id=None, tag=None, older_than=None, duplicates=False,
+                fetch_tags=None, now=None):
+    # Returns the selected task dicts, oldest first
+    now = time.time() if now is None else now
+    matches_title = titleMatcher(title) if title else None
+    selected = []
+    for task in tasks:
+        if matches_title is not None and not matches_title(task["title"]):
+            continue
+        if category_id is not None and _int(task.get("category_id")) != category_id:
+            continue
+        if older_than is not None and now - _int(task.get("date_modification")) < older_than * DAY:
+            continue
+        selected.append(task)
+    selected.sort(key=lambda task: _int(task["id"]))
+
+    if duplicates:
+        first_seen = set()
+        dupes = []
+        for task in selected:
+            if task["title"] in first_seen:
+                dupes.append(task)
+            else:
+                first_seen.add(task["title"])
+        selected = dupes
+
+    if tag is not None and selected:
+        tags = fetch_tags([_int(task["id"]) for task in selected])
+        wanted = tag.lower()
+        selected = [task for task in selected if wanted in (name.lower() for name in tags.get(_int(task["id"]), ()))]
+    return selected
+
+
+def printPlan(tasks, category_names=None):
+    category_names = category_names or {}
+    for task in tasks:
+        modified = datetime.datetime.fromtimestamp(_int(task.get("date_modification"))).strftime("%Y-%m-%d")
+        category = category_names.get(_int(task.get("category_id")), "")
+        print(f"  Task ID:{task['id']}  Task Name:{task['title']}  Category:{category}  Modified:{modified}")
+    print(f"  {len(tasks)} tasks selected")
+
+
+class Journal:
+    # One JSON line per removal attempt, fsynced so a crash loses nothing
+    def __init__(self, path):
+        self.path = path
+        self.removed = set()
+        self._lock = threading.Lock()
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as fp:
+                line = ""
+                for line in fp:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # last line may be cut off by the crash
+                    if entry.get("removed"):
+                        self.removed.add(entry["task_id"])
+            if line and not line.endswith("\n"):
+                # Start the next entry on a line of its own
+                with open(path, "a", encoding="utf-8") as fp:
+                    fp.write("\n")
+
+    def record(self, entries):
+        lines = [json.dumps(entry) + "\n" for entry in entries]
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fp:
+                fp.writelines(lines)
+                fp.flush()
+                os.fsync(fp.fileno())
+            self.removed.update(entry["task_id"] for entry in entries if entry["removed"])
+
+
+def removeSelected(tasks, remove_batch, journal, batch_size=50, workers=4):
+    """
+    remove_batch: task ids -> {task_id: BatchCall} (newCompany.removeTasks)
+    Returns counts of removed, skipped (in the journal) and failed tasks.
+    """
+    stats = {"removed": 0, "skipped": 0, "failed": 0}
+    titles = {}
+    pending = []
+    for task in tasks:
+        task_id = _int(task["id"])
+        if task_id in journal.removed:
+            stats["skipped"] += 1
+        else:
+            titles[task_id] = task["title"]
+            pending.append(task_id)
+
+    def runChunk(chunk):
+        calls = remove_batch(chunk)
+        entries = []
+        for task_id in chunk:
+            call = calls[task_id]
+            error = call.error if call.error is not None else (None if call.result else "removeTask returned false")
+            entries.append({"task_id": task_id, "title": titles[task_id], "removed": error is None,
+                            "error": None if error is None else str(error)})
+        journal.record(entries)
+        return entries
+
+    chunks = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for entries in executor.map(runChunk, chunks):
+            for entry in entries:
+                if entry["removed"]:
+                    stats["removed"] += 1
+                else:
+                    stats["failed"] += 1
+                    print(f"  FAILED Task ID:{entry['task_id']} {entry['title']}: {entry['error']}")
+    return stats
@@ -0,0 +1,131 @@
+"""
+Bulk import of companies from a CSV or JSONL file.
+
+CSV files need a header row with at least "company" and "url" columns,
+optional "tags" (separated by ";") and "link_title". JSONL files hold one
+object per line with the same keys, "tags" may be a list.
+
+Existing categories and tasks are fetched once up front; rows whose task
+title already exists in the project, or appeared earlier in the file, are
+skipped. Rows are onboarded in chunks of `batch_size` with `workers` chunks
+in flight, and every finished row is appended to a checkpoint file, so an
+interrupted import run again with the same file only does the rest.
+"""
+import csv
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from onboarding import Company
+
+
+def _splitTags(tags):
+    if isinstance(tags, list):
+        return [str(tag).strip() for tag in tags if str(tag).strip()]
+    return [tag.strip() for tag in (tags or "").split(";") if tag.strip()]
+
+
+def iterRows(path):
+    # Yields (row number, Company), row numbers count data rows from 1
+    with open(path, newline="", encoding="utf-8") as fp:
+        if path.lower().endswith((".jsonl", ".ndjson", ".json")):
+            rows = (json.loads(line) for line in fp if line.strip())
+        else:
+            rows = csv.DictReader(fp)
+        for number, row in enumerate(rows, 1):
+            name = (row.get("company") or "").strip()
+            if not name:
+                continue
+            company = Company(
+                name,
+                (row.get("url") or "").strip(),
+                tags=_splitTags(row.get("tags")),
+                link_title=(row.get("link_title") or "").strip() or None,
+            )
+            company.row = number
+            yield number, company
+
+
+class Checkpoint:
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        self._lock = threading.Lock()
+        if os.path.isfile(path):
+            with open(path, encoding="utf-8") as fp:
+                for line in fp:
+                    try:
+                        self.done.add(json.loads(line)["row"])
+                    except (ValueError, KeyError):
+                        # Last line may be cut off by the interruption
+                        pass
+
+    def record(self, companies):
+        lines = [
+            json.dumps({
+                "row": c.row,
+                "company": c.name,
+                "category_id": c.category_id,
+                "task_id": c.task_id,
+                "link_id": c.link_id,
+                "error": None if c.error is None else str(c.error),
+            }) + "\n"
+            for c in companies
+        ]
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fp:
+                fp.writelines(lines)
+                fp.flush()
+                os.fsync(fp.fileno())
+            self.done.update(c.row for c in companies)
+
+
+def importCompanies(path, project_id, onboarding, task_titles, batch_size=50, workers=4, checkpoint_path=None):
+    """
+    onboarding: an onboarding.Onboarding, its category cache is loaded once here
+    task_titles: titles of the tasks already in the project
+    Returns counts of imported, skipped (duplicate or already done) and failed rows.
+    """
+    checkpoint = Checkpoint(checkpoint_path or path + ".checkpoint")
+    onboarding.preload(project_id)
+    seen = set(task_titles)
+    stats = {"imported": 0, "skipped": 0, "failed": 0}
+
+    def runChunk(chunk):
+        companies = onboarding.run(project_id, chunk)
+        # Rows whose task exists are done even if the link failed, running
+        # them again would create a duplicate task
+        checkpoint.record([c for c in companies if c.task_id is not None])
+        return companies
+
+    def collect(futures):
+        for future in futures:
+            for company in future.result():
+                if company.error is None:
+                    stats["imported"] += 1
+                else:
+                    stats["failed"] += 1
+                    print(f"  FAILED row {company.row} {company.name}: {company.error}")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        chunk = []
+        for number, company in iterRows(path):
+            if number in checkpoint.done or company.name in seen:
+                stats["skipped"] += 1
+                continue
+            seen.add(company.name)
+            chunk.append(company)
+            if len(chunk) >= batch_size:
+                in_flight.add(executor.submit(runChunk, chunk))
+                chunk = []
+            if len(in_flight) >= workers:
+                # Only read ahead as far as there are free workers
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(finished)
+        if chunk:
+            in_flight.add(executor.submit(runChunk, chunk))
+        collect(wait(in_flight).done)
+
+    return stats
@@ -0,0 +1,108 @@
+"""
+HTTP compression for Kanboard calls.
+
+Responses: we send Accept-Encoding and inflate gzip, deflate and (when the
+brotli package is installed) br bodies chunk by chunk as they are read, so
+a streamed getAllTasks is parsed while it downloads and never sits in
+memory compressed and inflated at once.
+
+Requests: bodies above a size threshold can be sent gzip compressed. PHP
+does not inflate request bodies on its own, so this only works when the
+web server in front of Kanboard does (Apache mod_deflate's input filter,
+for instance) and is off unless asked for.
+"""
+import zlib
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+CHUNK_SIZE = 65536
+
+
+def acceptEncoding():
+    return "br, gzip, deflate" if brotli is not None else "gzip, deflate"
+
+
+class _Deflate:
+    # "deflate" is zlib wrapped per the RFC but some servers send it raw
+    def __init__(self):
+        self._inflater = None
+        self._pending = b""
+
+    def decompress(self, data):
+        if self._inflater is None:
+            data = self._pending + data
+            if len(data) < 2:
+                self._pending = data
+                return b""
+            zlib_header = (data[0] & 0x0F) == 8 and (data[0] << 8 | data[1]) % 31 == 0
+            self._inflater = zlib.decompressobj(zlib.MAX_WBITS if zlib_header else -zlib.MAX_WBITS)
+        return self._inflater.decompress(data)
+
+    def flush(self):
+        return self._inflater.flush() if self._inflater is not None else b""
+
+
+class _Brotli:
+    def __init__(self):
+        self._inflater = brotli.Decompressor()
+
+    def decompress(self, data):
+        return self._inflater.process(data)
+
+    def flush(self):
+        return b""
+
+
+def decoder(content_encoding):
+    # Object with decompress(chunk)/flush(), None for identity bodies
+    encoding = (content_encoding or "").strip().lower()
+    if encoding in ("", "identity"):
+        return None
+    if encoding in ("gzip", "x-gzip"):
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == "deflate":
+        return _Deflate()
+    if encoding == "br" and brotli is not None:
+        return _Brotli()
+    raise ValueError(f"Unsupported Content-Encoding: {content_encoding}")
+
+
+class DecodingReader:
+    # File-like view of a compressed response that inflates as it is read
+    def __init__(self, fp, inflater, chunk_size=CHUNK_SIZE):
+        self.fp = fp
+        self.inflater = inflater
+        self.chunk_size = chunk_size
+        self._buffer = b""
+        self._eof = False
+
+    def read(self, size=None):
+        while not self._eof and (size is None or size < 0 or len(self._buffer) < size):
+            chunk = self.fp.read(self.chunk_size)
+            if chunk:
+                self._buffer += self.inflater.decompress(chunk)
+            else:
+                self._buffer += self.inflater.flush()
+                self._eof = True
+        if size is None or size < 0 or size >= len(self._buffer):
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def decodingReader(fp, content_encoding):
+    inflater = decoder(content_encoding)
+    return fp if inflater is None else DecodingReader(fp, inflater)
+
+
+def compressBody(body, min_size):
+    # (body, extra headers); min_size 0 never compresses
+    if not min_size or len(body) < min_size:
+        return body, {}
+    data = body.encode() if isinstance(body, str) else body
+    deflater = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip framing
+    return deflater.compress(data) + deflater.flush(), {"Content-Encoding": "gzip"}
@@ -0,0 +1,156 @@
+import contextlib
+import http.client
+import threading
+import time
+
+# Raised when the server has closed a kept-alive socket behind our back
+STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+def splitSite(site):
+    # KB_SITE may be a bare host ("kanboard.example.com") or a url with an
+    # optional sub folder ("https://example.com/kanboard"). Plain http is
+    # only kept for local servers.
+    conn_class = http.client.HTTPSConnection
+    if site.startswith("http://"):
+        conn_class = http.client.HTTPConnection
+        site = site[len("http://"):]
+    elif site.startswith("https://"):
+        site = site[len("https://"):]
+    host, _, base_path = site.partition("/")
+    base_path = base_path.strip("/")
+    return conn_class, host, "/" + base_path if base_path else ""
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of keep-alive connections to one Kanboard site.
+
+    At most `size` connections are open at once; callers block until one is
+    free. Idle connections older than `idle_timeout` seconds are closed, and
+    a request on a socket the server already dropped (before it could have
+    been processed) is sent again once on a fresh connection.
+    """
+
+    def __init__(self, site, size=4, idle_timeout=60, timeout=None):
+        self.conn_class, self.host, self.base_path = splitSite(site)
+        self.rpc_path = self.base_path + "/jsonrpc.php"
+        self.size = max(1, int(size))
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self._idle = []  # (conn, last_used), oldest first
+        self._in_use = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def _newConnection(self):
+        conn = self.conn_class(self.host, timeout=self.timeout)
+        # Time the TCP connect on its own so the TLS handshake can be told apart
+        create = conn._create_connection
+
+        def timedCreate(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return create(*args, **kwargs)
+            finally:
+                conn.tcp_time = time.perf_counter() - start
+
+        conn._create_connection = timedCreate
+        return conn
+
+    def _evictIdle(self, now):
+        # Caller holds the lock
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            conn, last_used = self._idle.pop(0)
+            conn.close()
+
+    def _acquire(self):
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("ConnectionPool is closed")
+                self._evictIdle(time.monotonic())
+                if self._idle:
+                    conn, last_used = self._idle.pop()
+                    self._in_use += 1
+                    return conn, True
+                if self._in_use < self.size:
+                    self._in_use += 1
+                    break
+                self._cond.wait()
+        return self._newConnection(), False
+
+    def _release(self, conn, reusable):
+        with self._cond:
+            self._in_use -= 1
+            if reusable and not self._closed:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                conn.close()
+            self._cond.notify()
+
+    def _exchange(self, conn, method, url, body, headers):
+        # The response carries `timings`: connect and tls (new connections
+        # only) and server, the time until the response headers arrived
+        timings = {}
+        conn.sent = False
+        if conn.sock is None:
+            conn.tcp_time = 0.0
+            start = time.perf_counter()
+            conn.connect()
+            timings["connect"] = conn.tcp_time
+            if isinstance(conn, http.client.HTTPSConnection):
+                timings["tls"] = time.perf_counter() - start - conn.tcp_time
+        start = time.perf_counter()
+        conn.request(method, url, body, headers)
+        conn.sent = True
+        res = conn.getresponse()
+        timings["server"] = time.perf_counter() - start
+        res.timings = timings
+        return res
+
+    def _send(self, conn, reused, method, url, body, headers):
+        try:
+            return self._exchange(conn, method, url, body, headers)
+        except STALE_ERRORS as error:
+            # Only resend when the server cannot have processed the request:
+            # sending failed or the socket closed without a status line.
+            # Anything later is left to the retry policy, which never sends
+            # a write twice.
+            if not reused or (conn.sent and not isinstance(error, http.client.RemoteDisconnected)):
+                raise
+            # Kept-alive socket was closed by the server, reconnect once
+            conn.close()
+            return self._exchange(conn, method, url, body, headers)
+
+    @contextlib.contextmanager
+    def response(self, method, url, body=None, headers=None):
+        # Yields the http.client response. The connection only goes back to
+        # the pool when the body was read to the end, otherwise the unread
+        # bytes would be taken as the answer to the next request.
+        conn, reused = self._acquire()
+        reusable = False
+        try:
+            res = self._send(conn, reused, method, url, body, headers or {})
+            yield res
+            reusable = res.isclosed()
+        finally:
+            self._release(conn, reusable)
+
+    def request(self, method, url, body=None, headers=None):
+        with self.response(method, url, body, headers) as res:
+            return res.read()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            for conn, last_used in self._idle:
+                conn.close()
+            self._idle = []
+            self._cond.notify_all()
@@ -0,0 +1,185 @@
+"""
+Local daemon that keeps connections and caches warm between command lines.
+
+A cold newCompany.py run reads .env, imports its modules, opens a new HTTPS
+connection and fetches getAllProjects before it does any work. The daemon
+pays that once: it keeps newCompany loaded with its connection pool, lookup
+cache and response cache, and runs every command line sent to its Unix
+socket through newCompany.main(), one at a time, streaming the output back.
+
+  export KB_DAEMON_SOCKET=~/.cache/kanboard-api/daemon.sock
+  python src/newCompany.py -m daemon &
+  python src/newCompany.py -m fleet --title Zillow     (runs in the daemon)
+
+With KB_DAEMON_SOCKET set, newCompany.py hands its arguments to forward()
+before loading anything else, and runs them itself when no daemon answers.
+Commands run with the daemon's environment and connection settings, and
+prompts cannot be answered through it, so pass -p and -f. --gui and the
+servers (-m daemon, web, webhook) always run locally.
+
+Protocol, one JSON object per line: {"argv": [...], "cwd": "..."} in,
+{"out": "text"} lines and a final {"exit": status} back.
+"""
+import io
+import json
+import os
+import socket
+import sys
+
+# The client side is on every forwarded command's startup path, so it only
+# imports the above; the daemon side imports the rest when it runs
+
+LOCAL_ONLY = ("-g", "--gui")
+
+# Servers run until stopped and would block the daemon's one command at a time
+LOCAL_METHODS = ("daemon", "web", "webhook")
+
+
+def socketPath(path=None):
+    path = path or os.getenv("KB_DAEMON_SOCKET")
+    return os.path.expanduser(path) if path else None
+
+
+def _forwardable(argv):
+    for i, arg in enumerate(argv):
+        if arg in LOCAL_ONLY:
+            return False
+        method = argv[i + 1] if arg in ("-m", "--method") and i + 1 < len(argv) else None
+        if arg.startswith("--method="):
+            method = arg.partition("=")[2]
+        elif arg.startswith("-m") and len(arg) > 2:
+            method = arg[2:]
+        if method in LOCAL_METHODS:
+            return False
+    return True
+
+
+def forward(argv, path=None):
+    # Exits with the daemon's status, returns when there is no daemon
+    path = socketPath(path)
+    if not path or not _forwardable(argv):
+        return
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return
+    with sock, sock.makefile("rb") as answer:
+        sock.sendall(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode() + b"\n")
+        for line in answer:
+            message = json.loads(line)
+            if "out" in message:
+                sys.stdout.write(message["out"])
+                sys.stdout.flush()
+            elif "exit" in message:
+                sys.exit(message["exit"])
+    print("  ERROR: the daemon closed the connection before the command finished")
+    sys.exit(1)
+
+
+class _Output(io.TextIOBase):
+    # stdout of a forwarded command, sent to the client as it is written
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.gone = False
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.send({"out": text})
+        return len(text)
+
+    def send(self, message):
+        if self.gone:
+            return  # client hung up, let the command finish quietly
+        try:
+            self.wfile.write(json.dumps(message).encode() + b"\n")
+            self.wfile.flush()
+        except OSError:
+            self.gone = True
+
+
+def runCommand(main, argv, cwd, out):
+    # Returns the exit status of main(argv)
+    import contextlib
+    import traceback
+    previous, stdin = os.getcwd(), sys.stdin
+    try:
+        os.chdir(cwd or previous)
+        sys.stdin = io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(out):
+            try:
+                main(argv)
+            except SystemExit as exit:
+                if exit.code is None or isinstance(exit.code, int):
+                    return exit.code or 0
+                print(exit.code)
+                return 1
+            except EOFError:
+                print("  ERROR: this command prompts for input, pass -p/-f when going through the daemon")
+                return 1
+            except Exception:
+                traceback.print_exc(file=out)
+                return 1
+        return 0
+    finally:
+        sys.stdin = stdin
+        os.chdir(previous)
+
+
+def _handle(main, conn):
+    with conn, conn.makefile("rb") as rfile, conn.makefile("wb") as wfile:
+        line = rfile.readline()
+        if not line:
+            return
+        request = json.loads(line)
+        out = _Output(wfile)
+        status = runCommand(main, request["argv"], request.get("cwd"), out)
+        out.send({"exit": status})
+
+
+def serve(main, path=None):
+    path = socketPath(path)
+    if not path:
+        print("  daemon needs KB_DAEMON_SOCKET=<socket file>")
+        sys.exit(1)
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)  # left over from a daemon that died
+        else:
+            print(f"  A daemon is already listening on {path}")
+            sys.exit(1)
+        finally:
+            probe.close()
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # The daemon holds the API token, only our own user may talk to it
+    old_umask = os.umask(0o177)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen()
+    print(f"  Daemon listening on {path}")
+    sys.stdout.flush()
+    try:
+        # One command at a time: commands share module state and redirect stdout
+        while True:
+            conn, _ = server.accept()
+            try:
+                _handle(main, conn)
+            except (OSError, ValueError) as error:
+                print(f"  Dropped a request: {error}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if os.path.exists(path):
+            os.unlink(path)
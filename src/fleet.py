@@ -0,0 +1,48 @@
+"""
+Fleet-wide queries: run one per-project query over many projects at once.
+
+fanOut() calls `query(project_id)` for every project on a bounded thread
+pool and yields a ProjectResult per project in completion order, so
+results are printed while slower projects are still on the wire, and a
+failing project is reported on its own instead of ending the sweep.
+
+  for result in fanOut(project_ids, lambda pid: findTasks(pid, is_zillow), workers=8):
+      if result.error is not None:
+          print(result.project_id, "failed:", result.error)
+      else:
+          print(result.project_id, len(result.value), "matches")
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+
+
+class ProjectResult:
+    __slots__ = ("project_id", "value", "error", "seconds")
+
+    def __init__(self, project_id, value=None, error=None, seconds=0.0):
+        self.project_id = project_id
+        self.value = value
+        self.error = error
+        self.seconds = seconds
+
+
+def _run(query, project_id):
+    start = time.perf_counter()
+    try:
+        value = query(project_id)
+    except Exception as error:
+        return ProjectResult(project_id, error=error, seconds=time.perf_counter() - start)
+    return ProjectResult(project_id, value, seconds=time.perf_counter() - start)
+
+
+def fanOut(project_ids, query, workers=4):
+    # Stopping the iteration early cancels the projects not yet started
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [pool.submit(_run, query, project_id) for project_id in project_ids]
+        try:
+            for future in as_completed(futures):
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
@@ -1,18 +1,17 @@
-import http.client
 import json
 import sys
-import argparse
 import os
-from dotenv import load_dotenv
-import logging
-import tkinter as tk
-from tkinter import ttk
+from apiConnector import APIConnector, configure
 
 # Check if .env file exists in same folder!
 wdir = os.path.dirname(os.path.realpath(__file__))
-envFile = wdir + "\\.env"
+envFile = os.path.join(wdir, ".env")
 if os.path.isfile(envFile):
-    load_dotenv()
+    # Values already exported (cron jobs) win over .env anyway, so the
+    # python-dotenv import is skipped when both are set
+    if not (os.getenv("KB_SITE") and os.getenv("KB_TOKEN")):
+        from dotenv import load_dotenv
+        load_dotenv()
     KB_SITE=os.getenv("KB_SITE")
     KB_TOKEN=os.getenv("KB_TOKEN")
 else:
@@ -30,49 +29,88 @@ if KB_SITE == "" or KB_SITE == None or KB_TOKEN == "" or KB_TOKEN == None:
     print("  -- KB_TOKEN=<kanboard-token>")
     sys.exit(1)
 
+# Projects selectAProject lists at once, typing a name narrows them down
+PICKER_ROWS = 30
+
 _debug = 0
 _method = ""
 _project_id = -1
-
-
-class APIConnector:
-    def __init__(self):
-        self.conn = http.client.HTTPSConnection(KB_SITE)
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": "Basic " + KB_TOKEN,
-        }
-
-    def callback(self):
-        self.entry.delete(0, tk.END)
-
+_pool_size = int(os.getenv("KB_POOL_SIZE") or 4)
+_timeout = float(os.getenv("KB_TIMEOUT") or 60)
+_rate = float(os.getenv("KB_RATE") or 0)
+_retries = int(os.getenv("KB_RETRIES") or 3)
+_compress_min = int(os.getenv("KB_COMPRESS_MIN") or 0)
+configure(site=KB_SITE, token=KB_TOKEN, pool_size=_pool_size, timeout=_timeout, rate=_rate, retries=_retries,
+          compress_min=_compress_min)
+
+# getAllProjects results kept between runs, see responseCache.py
+_response_cache = None
+
+
+def openResponseCache(refresh=False):
+    from responseCache import ResponseCache, defaultDirectory
+    return ResponseCache(
+        os.getenv("KB_CACHE_DIR") or defaultDirectory(),
+        KB_SITE,
+        KB_TOKEN,
+        ttl=int(os.getenv("KB_RESPONSE_TTL") or 600),
+        max_bytes=int(os.getenv("KB_CACHE_MB") or 50) * 1024 * 1024,
+        refresh=refresh,
+    )
 
 def getAllProjects(api):
-    payload = json.dumps({"jsonrpc": "2.0", "method": "getAllProjects", "id": 1})
+    if _response_cache is not None:
+        hit, all_projects = _response_cache.get("getAllProjects")
+        if hit:
+            return all_projects
 
-    api.conn.request("GET", "/jsonrpc.php", payload, api.headers)
-    res = api.conn.getresponse()
-    data = res.read()
+    payload = json.dumps({"jsonrpc": "2.0", "method": "getAllProjects", "id": 1})
 
-    all_projects = json.loads(data)["result"]
+    all_projects = api.rpc(payload)
 
+    if _response_cache is not None:
+        _response_cache.put("getAllProjects", None, all_projects)
     return all_projects
 
 
+def iterAllTasks(project_id=1, status_id=1):
+    payload = json.dumps(
+        {
+            "jsonrpc": "2.0",
+            "method": "getAllTasks",
+            "id": 1,
+            "params": {"project_id": project_id, "status_id": status_id},
+        }
+    )
+    yield from APIConnector().stream(payload, "getAllTasks")
+
+
 def selectAProject(all_projects):
+    # Typing part of a name narrows the list down (searchIndex.py), a number selects
+    from searchIndex import SearchIndex
+    index = SearchIndex((i, project["name"]) for i, project in enumerate(all_projects))
+    shown = list(range(len(all_projects)))
     loop = True
     while loop:
-        for i, project in enumerate(all_projects):
-            print("  " + str(i) + ". " + project["name"])
+        for i in shown[:PICKER_ROWS]:
+            print("  " + str(i) + ". " + all_projects[i]["name"])
+        if len(shown) > PICKER_ROWS:
+            print(f"  ... {len(shown) - PICKER_ROWS} more, type part of a name to narrow down")
 
         print("\n")
         print(f"  Select a Project:")
-        user_input = input("  Enter number (x to exit): ")
+        user_input = input("  Enter number or name (x to exit): ")
 
         if user_input == "x":
             print(f"  User Entered:{user_input}\n", "...Exiting...")
             loop = False
 
+        elif not user_input.strip().isdigit():
+            shown = index.search(user_input, limit=None) if user_input.strip() else list(range(len(all_projects)))
+            if not shown:
+                print(f"  No project matches:{user_input}, try again.")
+                shown = list(range(len(all_projects)))
+
         else:
             try:
                 num = int(user_input)
@@ -89,7 +127,7 @@ def selectAProject(all_projects):
                     )
 
                 return selected_project
-            except ValueError:
+            except (ValueError, IndexError):
                 print(f"  Invalid Entry:{user_input}, try again.")
 
     sys.exit(0)
@@ -112,30 +150,9 @@ def function():
     pass
 
 
-# Treeview sort column variable
-default_sort_column = "one"
-
-
-def sort_column(tv, col, reverse):
-    l = [(tv.set(k, col), k) for k in tv.get_children("")]
-    l.sort(reverse=reverse)
-
-    # rearrange items in sorted positions
-    for index, (val, k) in enumerate(l):
-        tv.move(k, "", index)
-
-    # set sort column binding
-    tv.heading(col, command=lambda: sort_column(tv, col, not reverse))
-
-
-def callback(event):
-    selection = combobox.get()
-
-
-#  entry.delete(0, tk.END)
-#  entry.insert(0, selection)
-
 if __name__ == "__main__":
+    import argparse
+
     parser = argparse.ArgumentParser(description="Kan Board API Client")
     parser.add_argument("-d", "--debug", default=0, help="Enable debug output", type=int)
     parser.add_argument("-m", "--method", default="gp", help="API Method", type=str)
@@ -146,7 +163,20 @@ if __name__ == "__main__":
         "-v", "--version", help="Show version and exit", action="store_true"
     )
     parser.add_argument("-g", "--gui", help="Run GUI", action="store_true")
+    parser.add_argument("--pool_size", default=_pool_size, help="Max open connections to Kanboard", type=int)
+    parser.add_argument("--no-cache", "--no_cache", dest="no_cache", help="Do not use the on-disk response cache", action="store_true")
+    parser.add_argument("--refresh", help="Refetch instead of reading the response cache, results are still stored", action="store_true")
+    parser.add_argument("--rate", default=_rate, help="Max requests per second to Kanboard, 0 for no limit", type=float)
+    parser.add_argument("--retries", default=_retries, help="Retries of failed read calls", type=int)
+    parser.add_argument("--compress_min", default=_compress_min, help="Gzip request bodies from this many bytes on, 0 never (needs server support)", type=int)
+    parser.add_argument("--metrics", default=os.getenv("KB_METRICS"), help="Write per-method call metrics here on exit: *.json for JSON, - or any other name for Prometheus text", type=str)
+    parser.add_argument("--trace", help="Print one line per Kanboard request with its timings", action="store_true")
     args = parser.parse_args()
+    _pool_size = args.pool_size
+    _rate = args.rate
+    _retries = args.retries
+    _compress_min = args.compress_min
+    configure(pool_size=_pool_size, rate=_rate, retries=_retries, compress_min=_compress_min)
 
     if args.debug:
         if args.debug > 0:
@@ -180,83 +210,24 @@ if __name__ == "__main__":
     if args.name:
         print("Project Name:", args.name)
 
+    if not args.no_cache:
+        _response_cache = openResponseCache(args.refresh)
+
     # print(type(args.project_id), args.project_id)
     api = APIConnector()
-    all_projects = getAllProjects(api)
+    if args.trace:
+        from metrics import printTrace
+        api.metrics.addHook(printTrace)
+    if args.metrics:
+        import atexit
+        atexit.register(api.metrics.write, args.metrics)
 
     if args.gui:
-        root = tk.Tk()
-        root.title("Kan Board API Client")
-        root.geometry("800x600")
-        tree = ttk.Treeview(root)
-        tree["columns"] = ("one", "two")
-        tree.column("#0", width=270, minwidth=270, stretch=tk.NO)
-        tree.column("one", width=150, minwidth=150, stretch=tk.NO)
-        tree.column("two", width=400, minwidth=200)
-
-        tree.heading("#0", text="Project ID", anchor=tk.W)
-        tree.heading("one", text="Name", anchor=tk.W)
-
-        for project in all_projects:
-            tree.insert("", tk.END, text=project["id"], values=(project["name"]))
-
-        tree.pack(pady=20)
-
-        # Set sort to Project ID on startup
-        sort_column(tree, default_sort_column, False)
-        # Bind left click to sort
-        tree.bind(
-            "<Button-1>",
-            lambda evt: sort_column(tree, tree.identify_column(evt.x), False),
-        )
-
-        project_var = tk.StringVar(root)
-        project_var.set(all_projects[0]["name"])
-
-        option_menu = tk.OptionMenu(root, project_var, *all_projects)
-        option_menu.pack()
-
-        button = tk.Button(
-            root, text="Select A Project", command=lambda: selectAProject(all_projects)
-        )
-        button.pack()
-
-        combobox = ttk.Combobox(root, values=all_projects)
-        combobox.pack(pady=10)
-        combobox.bind("<<ComboboxSelected>>", callback)
-
-        project_cb = ttk.Combobox(root, values=[p["name"] for p in all_projects])
-        project_cb.pack()
-
-        # Table
-        table = ttk.Treeview(root)
-
-        table["columns"] = ("id", "name")
-        table.column("#0", width=0, stretch=tk.NO)
-        table.column("id", anchor="center", width=80)
-        table.column("name", anchor="center", width=80)
-
-        table.heading("id", text="ID", anchor="center")
-        table.heading("name", text="Task", anchor="center")
-
-        table.pack()
-
-        project_label = ttk.Label(root, text="Project:")
-        project_label.pack()
-
-        def on_project_change(event):
-            selected_project = project_cb.get()
-            project_label.config(text="Project: " + selected_project)
-            for project in all_projects:
-                if project["name"] == selected_project:
-                    table.delete(*table.get_children())
-                    # for task in project['tasks']:
-                    #    table.insert('', 'end', values=(task['id'], task['name']))
-                    break
-
-        project_cb.bind("<<ComboboxSelected>>", on_project_change)
-        root.mainloop()
+        # Projects are loaded on a worker thread once the window is up
+        from gui import runGUI
+        runGUI(lambda: getAllProjects(api), selectAProject, iterAllTasks)
     else:
+        all_projects = getAllProjects(api)
         print(f"  Method:{_method}")
         if _method == "gp":
             if _project_id > -1:
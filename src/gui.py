@@ -0,0 +1,371 @@
+# Tk front end shared by getAllProjects.py and newCompany.py. Only imported
+# for --gui runs so command-line runs never load tkinter.
+#
+# Kanboard calls run on worker threads and hand their results to the Tk
+# loop through a queue, so the window is up and responsive while data is
+# on the wire. Tables keep their rows in a Python list and only the
+# visible rows exist as Treeview items. The project and task comboboxes
+# filter as you type through a SearchIndex (searchIndex.py).
+from collections import OrderedDict
+from operator import itemgetter
+import queue
+import threading
+import tkinter as tk
+from tkinter import ttk
+
+from searchIndex import SearchIndex
+
+# How often the Tk loop picks up results from the worker threads
+POLL_MS = 30
+
+# Rows handed to the Tk loop at once while a task list streams in
+PAGE_SIZE = 200
+
+# Task lists of recently viewed projects kept for instant switching back
+RECENT_PROJECTS = 8
+
+# Matches offered in a combobox dropdown while typing
+COMBO_ROWS = 50
+
+# Keys that move through a combobox instead of typing into it
+NAVIGATION_KEYS = ("Return", "KP_Enter", "Up", "Down", "Escape", "Tab")
+
+
+def _typed(kind, value):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return kind()
+
+
+class Worker:
+    # Runs jobs off the Tk thread, callbacks run on the Tk thread
+    def __init__(self, root):
+        self.root = root
+        self.results = queue.Queue()
+        self.root.after(POLL_MS, self._poll)
+
+    def run(self, job, on_done, on_error=None):
+        def target():
+            try:
+                self.results.put((on_done, job()))
+            except Exception as error:
+                self.results.put((on_error or self._report, error))
+
+        threading.Thread(target=target, daemon=True).start()
+
+    def stream(self, job, row, on_page, on_done, cancel, on_error=None, page_size=PAGE_SIZE):
+        # job() returns an iterator (e.g. iterAllTasks); row(item) builds the
+        # table row on the worker thread. Setting the `cancel` Event stops
+        # the load and drops any page still waiting in the queue.
+        def guarded(callback):
+            return lambda value: None if cancel.is_set() else callback(value)
+
+        def target():
+            items = None
+            try:
+                items = job()
+                page = []
+                for item in items:
+                    if cancel.is_set():
+                        return
+                    page.append(row(item))
+                    if len(page) >= page_size:
+                        self.results.put((guarded(on_page), page))
+                        page = []
+                if page:
+                    self.results.put((guarded(on_page), page))
+                self.results.put((guarded(on_done), None))
+            except Exception as error:
+                self.results.put((guarded(on_error or self._report), error))
+            finally:
+                # Closing a streaming RPC drops its half-read connection
+                close = getattr(items, "close", None)
+                if close is not None:
+                    close()
+
+        threading.Thread(target=target, daemon=True).start()
+
+    def _report(self, error):
+        print(f"  ERROR: {error}")
+
+    def _poll(self):
+        # One failing callback must neither stop polling nor drop the rest
+        try:
+            while True:
+                callback, value = self.results.get_nowait()
+                try:
+                    callback(value)
+                except Exception as error:
+                    self._report(error)
+        except queue.Empty:
+            pass
+        finally:
+            self.root.after(POLL_MS, self._poll)
+
+
+class VirtualTable(ttk.Frame):
+    """
+    Treeview over a list of row tuples that only materializes the visible
+    rows. columns: [(key, heading, type, width)]; values are converted to
+    `type` once when rows are set, so sorting compares ints as ints.
+    """
+
+    def __init__(self, master, columns, height=15):
+        super().__init__(master)
+        self.columns = columns
+        self.height = height
+        self.rows = []
+        self.offset = 0
+        self.sort_index = None
+        self.reverse = False
+
+        self.tree = ttk.Treeview(self, columns=[c[0] for c in columns], show="headings", height=height, selectmode="browse")
+        for index, (key, heading, kind, width) in enumerate(columns):
+            self.tree.heading(key, text=heading, anchor=tk.W, command=lambda index=index: self.sortBy(index))
+            self.tree.column(key, width=width, minwidth=40, anchor=tk.W)
+        self.scroll = ttk.Scrollbar(self, orient="vertical", command=self._onScroll)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scroll.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.tree.bind("<MouseWheel>", lambda evt: self._scrollBy(-1 if evt.delta > 0 else 1))
+        self.tree.bind("<Button-4>", lambda evt: self._scrollBy(-1))
+        self.tree.bind("<Button-5>", lambda evt: self._scrollBy(1))
+        self.tree.bind("<Up>", lambda evt: self._scrollBy(-1))
+        self.tree.bind("<Down>", lambda evt: self._scrollBy(1))
+        self.tree.bind("<Prior>", lambda evt: self._scrollBy(-self.height))
+        self.tree.bind("<Next>", lambda evt: self._scrollBy(self.height))
+        self._render()
+
+    def _convert(self, rows):
+        kinds = [c[2] for c in self.columns]
+        return [tuple(_typed(kind, value) for kind, value in zip(kinds, row)) for row in rows]
+
+    def setRows(self, rows):
+        self.rows = self._convert(rows)
+        self.offset = 0
+        self._sort()
+        self._render()
+
+    def appendRows(self, rows):
+        self.rows.extend(self._convert(rows))
+        self._sort()
+        self._render()
+
+    def clear(self):
+        self.setRows([])
+
+    def sortBy(self, index, reverse=None):
+        # Clicking the sorted heading again flips the order
+        if reverse is None:
+            reverse = not self.reverse if index == self.sort_index else False
+        self.sort_index = index
+        self.reverse = reverse
+        self._sort()
+        self._render()
+
+    def _sort(self):
+        if self.sort_index is not None:
+            self.rows.sort(key=itemgetter(self.sort_index), reverse=self.reverse)
+
+    def selected(self):
+        selection = self.tree.selection()
+        if not selection:
+            return None
+        index = self.offset + self.tree.index(selection[0])
+        return self.rows[index] if index < len(self.rows) else None
+
+    def _scrollBy(self, rows):
+        self._moveTo(self.offset + rows)
+        return "break"
+
+    def _moveTo(self, offset):
+        offset = max(0, min(offset, len(self.rows) - self.height))
+        if offset != self.offset:
+            self.offset = offset
+            self._render()
+
+    def _onScroll(self, action, *args):
+        if action == "moveto":
+            self._moveTo(int(float(args[0]) * len(self.rows)))
+        elif action == "scroll":
+            step = self.height if args[1] == "pages" else 1
+            self._moveTo(self.offset + int(args[0]) * step)
+
+    def _render(self):
+        visible = self.rows[self.offset:self.offset + self.height]
+        items = self.tree.get_children("")
+        if len(items) > len(visible):
+            self.tree.delete(*items[len(visible):])
+            items = items[:len(visible)]
+        for item, row in zip(items, visible):
+            self.tree.item(item, values=row)
+        for row in visible[len(items):]:
+            self.tree.insert("", tk.END, values=row)
+        total = len(self.rows)
+        if total:
+            self.scroll.set(self.offset / total, min(1.0, (self.offset + self.height) / total))
+        else:
+            self.scroll.set(0.0, 1.0)
+
+
+def runGUI(loadProjects, selectAProject, iterTasks=None):
+    # loadProjects() -> projects, iterTasks(project_id) -> iterator of tasks
+    root = tk.Tk()
+    root.title("Kan Board API Client")
+    root.geometry("800x600")
+    worker = Worker(root)
+    all_projects = []
+    projects_by_name = {}
+    project_index = SearchIndex()  # project names
+    task_index = [SearchIndex()]  # task titles of the shown project
+    task_rows = {}  # task id -> row of the shown project
+    recent_tasks = OrderedDict()  # project_id -> rows, most recent last
+    loading = [None]  # cancel Event of the task load in flight
+
+    status = ttk.Label(root, text="Loading projects...")
+    status.pack(anchor=tk.W, padx=10)
+
+    tree = VirtualTable(root, [("id", "Project ID", int, 120), ("name", "Name", str, 400)], height=10)
+    tree.pack(pady=20, fill=tk.X, padx=10)
+
+    project_var = tk.StringVar(root)
+    option_menu = tk.OptionMenu(root, project_var, "")
+    option_menu.pack()
+
+    button = tk.Button(
+        root, text="Select A Project", command=lambda: selectAProject(all_projects)
+    )
+    button.pack()
+
+    # Task filter: typing narrows the table down to the matching titles
+    combobox = ttk.Combobox(root)
+    combobox.pack(pady=10)
+
+    def filter_tasks(event=None):
+        if event is not None and getattr(event, "keysym", None) in NAVIGATION_KEYS:
+            return
+        text = combobox.get()
+        if not text.strip():
+            table.setRows(list(task_rows.values()))
+            combobox["values"] = []
+            return
+        rows = [task_rows[task_id] for task_id in task_index[0].search(text, limit=None)]
+        table.setRows(rows)
+        combobox["values"] = [row[1] for row in rows[:COMBO_ROWS]]
+
+    combobox.bind("<KeyRelease>", filter_tasks)
+    combobox.bind("<<ComboboxSelected>>", filter_tasks)
+
+    project_cb = ttk.Combobox(root)
+    project_cb.pack()
+
+    # Table
+    table = VirtualTable(root, [("id", "ID", int, 80), ("name", "Task", str, 400)], height=10)
+    table.pack()
+
+    project_label = ttk.Label(root, text="Project:")
+    project_label.pack()
+
+    def on_projects_loaded(projects):
+        all_projects[:] = projects
+        projects_by_name.clear()
+        projects_by_name.update((p["name"], p) for p in projects)
+        status.config(text=f"{len(projects)} projects")
+        # Sort by Project ID on startup
+        tree.setRows([(p["id"], p["name"]) for p in projects])
+        tree.sortBy(0, False)
+
+        menu = option_menu["menu"]
+        menu.delete(0, tk.END)
+        for project in projects:
+            menu.add_command(label=project["name"], command=lambda name=project["name"]: project_var.set(name))
+        if projects:
+            project_var.set(projects[0]["name"])
+        project_index.update((p["name"], p["name"]) for p in projects)
+        project_cb["values"] = [p["name"] for p in projects]
+
+    def on_projects_failed(error):
+        status.config(text=f"Loading projects failed: {error}")
+
+    def show_tasks(project):
+        if loading[0] is not None:
+            loading[0].set()
+            loading[0] = None
+        project_id = int(project["id"])
+        combobox.set("")
+        task_rows.clear()
+        task_index[0] = SearchIndex()
+        if project_id in recent_tasks:
+            recent_tasks.move_to_end(project_id)
+            rows = recent_tasks[project_id]
+            task_rows.update((row[0], row) for row in rows)
+            task_index[0].update((row[0], row[1]) for row in rows)
+            table.setRows(rows)
+            status.config(text=f"{project['name']}: {len(table.rows)} tasks")
+            return
+        table.clear()
+        if iterTasks is None:
+            return
+
+        cancel = threading.Event()
+        loading[0] = cancel
+        rows = []
+        status.config(text=f"{project['name']}: loading tasks...")
+
+        def on_page(page):
+            rows.extend(page)
+            task_rows.update((row[0], row) for row in page)
+            task_index[0].update((row[0], row[1]) for row in page)
+            if combobox.get().strip():
+                filter_tasks()
+            else:
+                table.appendRows(page)
+            status.config(text=f"{project['name']}: {len(rows)} tasks, loading...")
+
+        def on_done(_):
+            loading[0] = None
+            recent_tasks[project_id] = rows
+            while len(recent_tasks) > RECENT_PROJECTS:
+                recent_tasks.popitem(last=False)
+            status.config(text=f"{project['name']}: {len(rows)} tasks")
+
+        def on_error(error):
+            loading[0] = None
+            status.config(text=f"{project['name']}: loading tasks failed: {error}")
+
+        worker.stream(
+            lambda: iterTasks(project_id),
+            lambda task: (task["id"], task["title"]),
+            on_page, on_done, cancel, on_error,
+        )
+
+    def on_project_change(event):
+        selected_project = project_cb.get()
+        project_label.config(text="Project: " + selected_project)
+        if selected_project in projects_by_name:
+            show_tasks(projects_by_name[selected_project])
+
+    def on_project_typed(event):
+        if event.keysym in NAVIGATION_KEYS:
+            return
+        text = project_cb.get()
+        if text.strip():
+            project_cb["values"] = project_index.search(text, COMBO_ROWS)
+        else:
+            project_cb["values"] = [p["name"] for p in all_projects]
+
+    def on_project_entered(event):
+        # Enter picks the best match of what was typed
+        if project_cb.get() not in projects_by_name:
+            matches = project_index.search(project_cb.get(), 1)
+            if not matches:
+                return
+            project_cb.set(matches[0])
+        on_project_change(event)
+
+    project_cb.bind("<<ComboboxSelected>>", on_project_change)
+    project_cb.bind("<KeyRelease>", on_project_typed)
+    project_cb.bind("<Return>", on_project_entered)
+    worker.run(loadProjects, on_projects_loaded, on_projects_failed)
+    root.mainloop()
@@ -0,0 +1,98 @@
+import codecs
+import json
+
+from rpcBatch import RPCError
+
+WHITESPACE = " \t\r\n"
+
+
+class StreamDecoder:
+    # Decodes JSON values one at a time from a binary file object (an
+    # http.client response), keeping only the not yet parsed tail in memory
+    def __init__(self, fp, chunk_size=65536):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.text = codecs.getincrementaldecoder("utf-8")()
+        self.decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size=None):
+        if self.eof:
+            return False
+        data = self.fp.read(size or self.chunk_size)
+        if not data:
+            self.eof = True
+            self.buf = self.buf[self.pos:] + self.text.decode(b"", final=True)
+        else:
+            self.buf = self.buf[self.pos:] + self.text.decode(data)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} in JSON-RPC response")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+                # A number ending right at the buffer end may continue in the
+                # next chunk
+                if end < len(self.buf) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Value is cut off, read more. Doubling keeps big values linear.
+            self._fill(size)
+            size *= 2
+
+    def drain(self):
+        while self._fill():
+            pass
+
+
+def iterResult(fp, method="", chunk_size=65536):
+    """
+    Yield the items of the "result" array of a JSON-RPC response as they
+    are parsed off `fp`. A non-list result yields nothing, an "error"
+    member raises RPCError.
+    """
+    stream = StreamDecoder(fp, chunk_size)
+    stream.expect("{")
+    while stream.peek() != "}":
+        key = stream.value()
+        stream.expect(":")
+        if key == "result" and stream.peek() == "[":
+            stream.expect("[")
+            while stream.peek() != "]":
+                yield stream.value()
+                if stream.peek() == ",":
+                    stream.pos += 1
+            stream.expect("]")
+        elif key == "error":
+            error = stream.value()
+            if error is not None:
+                raise RPCError(method, error)
+        else:
+            stream.value()
+        if stream.peek() == ",":
+            stream.pos += 1
+    stream.expect("}")
+    # Read to the end so the connection can go back to the pool
+    stream.drain()
@@ -0,0 +1,99 @@
+import threading
+import time
+
+CATEGORIES = "categories"
+TASKS = "tasks"
+
+
+class ProjectIndex:
+    # Hash indexes by id and by name over one project's categories or tasks
+    def __init__(self, items, name_key):
+        self.name_key = name_key
+        self.loaded_at = time.monotonic()
+        self.by_id = {}
+        self.by_name = {}
+        for item in items or []:
+            self.add(item)
+
+    def add(self, item):
+        self.by_id[str(item["id"])] = item
+        self.by_name.setdefault(item[self.name_key], []).append(item)
+
+    def remove(self, item_id):
+        item = self.by_id.pop(str(item_id), None)
+        if item is not None:
+            same_name = self.by_name.get(item[self.name_key], [])
+            same_name[:] = [i for i in same_name if str(i["id"]) != str(item_id)]
+            if not same_name:
+                self.by_name.pop(item[self.name_key], None)
+        return item
+
+
+class LookupCache:
+    """
+    Per project cache of categories and active tasks for name lookups.
+
+    A project is downloaded once through the `fetch` callable handed to
+    byName() and then answered from its indexes until `ttl` seconds have
+    passed. add() and remove() keep it in line with our own writes so it
+    does not need a refetch after createCategory/createTask/removeTask.
+    A ttl of 0 disables caching.
+    """
+
+    NAME_KEYS = {CATEGORIES: "name", TASKS: "title"}
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._indexes = {}  # (kind, project_id) -> ProjectIndex
+        self._owner = {}  # (kind, item_id) -> project_id, for remove()
+        self._lock = threading.RLock()
+
+    def _fresh(self, index):
+        return index is not None and time.monotonic() - index.loaded_at < self.ttl
+
+    def index(self, kind, project_id, fetch):
+        key = (kind, str(project_id))
+        with self._lock:
+            index = self._indexes.get(key)
+            if self._fresh(index):
+                return index
+        index = ProjectIndex(fetch(), self.NAME_KEYS[kind])
+        with self._lock:
+            if self.ttl > 0:
+                self._indexes[key] = index
+                for item_id in index.by_id:
+                    self._owner[(kind, item_id)] = str(project_id)
+        return index
+
+    def loaded(self, kind, project_id):
+        # The project's index if it is cached and fresh, never fetches
+        with self._lock:
+            index = self._indexes.get((kind, str(project_id)))
+            return index if self._fresh(index) else None
+
+    def byName(self, kind, project_id, name, fetch):
+        return list(self.index(kind, project_id, fetch).by_name.get(name, []))
+
+    def byId(self, kind, project_id, item_id, fetch):
+        return self.index(kind, project_id, fetch).by_id.get(str(item_id))
+
+    def add(self, kind, project_id, item):
+        with self._lock:
+            index = self._indexes.get((kind, str(project_id)))
+            if self._fresh(index):
+                index.add(item)
+                self._owner[(kind, str(item["id"]))] = str(project_id)
+
+    def remove(self, kind, item_id):
+        with self._lock:
+            project_id = self._owner.pop((kind, str(item_id)), None)
+            index = self._indexes.get((kind, project_id))
+            if index is not None:
+                return index.remove(item_id)
+        return None
+
+    def invalidate(self, kind=None, project_id=None):
+        with self._lock:
+            for key in list(self._indexes):
+                if (kind is None or key[0] == kind) and (project_id is None or key[1] == str(project_id)):
+                    del self._indexes[key]
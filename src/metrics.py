@@ -0,0 +1,247 @@
+"""
+Per-method instrumentation of Kanboard calls.
+
+Every HTTP request sent by APIConnector or the async client is recorded
+under its JSON-RPC method ("batch" for a batch of mixed methods): request
+and call counts, errors by kind, bytes sent and received, and latency
+histograms per phase:
+
+  connect  TCP connect, only for requests that opened a connection
+  tls      TLS handshake, likewise and https only
+  server   request sent until the response headers arrived
+  read     response body download (streamed calls: download and parsing)
+  decode   JSON parsing
+  total    the whole request
+
+  metrics.addHook(printTrace)    # one line per request
+  print(metrics.toPrometheus())  # or metrics.toJSON()
+"""
+from bisect import bisect_left
+import json
+import threading
+import time
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PHASES = ("connect", "tls", "server", "read", "decode", "total")
+
+
+def methodLabel(methods):
+    return methods[0] if len(set(methods)) == 1 else "batch"
+
+
+def errorKind(error):
+    status = getattr(error, "status", None)
+    if status is not None:
+        return f"http_{status}"
+    if hasattr(error, "code") and hasattr(error, "method"):
+        return "rpc"  # RPCError
+    return type(error).__name__
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        # [(upper bound, observations <= bound)], last bound is "+Inf"
+        total = 0
+        result = []
+        for bound, count in zip(BUCKETS + ("+Inf",), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MethodStats:
+    def __init__(self):
+        self.requests = 0
+        self.calls = 0
+        self.errors = {}  # kind -> count
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.phases = {phase: Histogram() for phase in PHASES}
+
+    def toDict(self):
+        errors = sum(self.errors.values())
+        return {
+            "requests": self.requests,
+            "calls": self.calls,
+            "errors": dict(self.errors),
+            "error_rate": errors / self.calls if self.calls else 0.0,
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "latency": {
+                phase: {
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "buckets": {str(bound): count for bound, count in histogram.cumulative()},
+                }
+                for phase, histogram in self.phases.items() if histogram.count
+            },
+        }
+
+
+class Timer:
+    # One request being measured, recorded when the with block ends
+    def __init__(self, metrics, methods, sent):
+        self.metrics = metrics
+        self.methods = methods
+        self.sent = sent
+        self.received = 0
+        self.phases = {}
+        self.start = self.last = time.perf_counter()
+
+    def mark(self):
+        self.last = time.perf_counter()
+
+    def phase(self, name):
+        # Time since the last mark or phase
+        now = time.perf_counter()
+        self.phases[name] = now - self.last
+        self.last = now
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.phases["total"] = time.perf_counter() - self.start
+        # Closing a stream early (GeneratorExit) is not an error
+        error = exc if isinstance(exc, Exception) else None
+        self.metrics.record(self.methods, self.phases, self.sent, self.received, error)
+
+
+class CountingReader:
+    # Wraps a response for streamed calls to count the bytes read
+    def __init__(self, fp):
+        self.fp = fp
+        self.count = 0
+
+    def read(self, size=None):
+        # None, not -1: HTTPResponse.read(-1) waits for the socket to close
+        data = self.fp.read(size)
+        self.count += len(data)
+        return data
+
+
+class Metrics:
+    def __init__(self):
+        self.methods = {}  # label -> MethodStats
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def addHook(self, hook):
+        # hook(trace) runs after every request, on the calling thread
+        self.hooks.append(hook)
+
+    def timer(self, methods, sent=0):
+        return Timer(self, methods, sent)
+
+    def _stats(self, label):
+        stats = self.methods.get(label)
+        if stats is None:
+            stats = self.methods[label] = MethodStats()
+        return stats
+
+    def record(self, methods, phases, sent=0, received=0, error=None):
+        label = methodLabel(methods)
+        with self._lock:
+            stats = self._stats(label)
+            stats.requests += 1
+            stats.calls += len(methods)
+            stats.bytes_sent += sent
+            stats.bytes_received += received
+            for phase, seconds in phases.items():
+                stats.phases[phase].observe(seconds)
+            if error is not None:
+                kind = errorKind(error)
+                stats.errors[kind] = stats.errors.get(kind, 0) + 1
+        for hook in self.hooks:
+            hook({
+                "method": label,
+                "calls": len(methods),
+                "phases": phases,
+                "sent": sent,
+                "received": received,
+                "error": error,
+            })
+
+    def countError(self, method, error):
+        # Errors found after the request itself went fine (RPC errors)
+        with self._lock:
+            stats = self._stats(method)
+            kind = errorKind(error)
+            stats.errors[kind] = stats.errors.get(kind, 0) + 1
+
+    def reset(self):
+        with self._lock:
+            self.methods = {}
+
+    def toDict(self):
+        with self._lock:
+            return {label: stats.toDict() for label, stats in sorted(self.methods.items())}
+
+    def toJSON(self):
+        return json.dumps(self.toDict(), indent=2)
+
+    def toPrometheus(self, prefix="kanboard_rpc"):
+        lines = []
+        with self._lock:
+            items = sorted(self.methods.items())
+            counters = (
+                ("requests_total", "HTTP requests sent", lambda s: s.requests),
+                ("calls_total", "JSON-RPC calls sent", lambda s: s.calls),
+                ("request_bytes_total", "Request body bytes", lambda s: s.bytes_sent),
+                ("response_bytes_total", "Response body bytes", lambda s: s.bytes_received),
+            )
+            for name, help_text, value in counters:
+                lines.append(f"# HELP {prefix}_{name} {help_text}")
+                lines.append(f"# TYPE {prefix}_{name} counter")
+                for label, stats in items:
+                    lines.append(f'{prefix}_{name}{{method="{_escape(label)}"}} {value(stats)}')
+            lines.append(f"# HELP {prefix}_errors_total Failed requests and calls by kind")
+            lines.append(f"# TYPE {prefix}_errors_total counter")
+            for label, stats in items:
+                for kind, count in sorted(stats.errors.items()):
+                    lines.append(f'{prefix}_errors_total{{method="{_escape(label)}",kind="{_escape(kind)}"}} {count}')
+            lines.append(f"# HELP {prefix}_seconds Request latency by phase")
+            lines.append(f"# TYPE {prefix}_seconds histogram")
+            for label, stats in items:
+                for phase, histogram in stats.phases.items():
+                    if not histogram.count:
+                        continue
+                    labels = f'method="{_escape(label)}",phase="{phase}"'
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{prefix}_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                    lines.append(f"{prefix}_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+                    lines.append(f"{prefix}_seconds_count{{{labels}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # "-" prints Prometheus text, *.json gets JSON, anything else Prometheus
+        text = self.toJSON() + "\n" if path.endswith(".json") else self.toPrometheus()
+        if path == "-":
+            print(text, end="")
+            return
+        with open(path, "w", encoding="utf-8") as fp:
+            fp.write(text)
+
+
+def printTrace(trace):
+    phases = " ".join(f"{phase}={seconds * 1000:.1f}ms" for phase, seconds in trace["phases"].items())
+    error = f" error={errorKind(trace['error'])}" if trace["error"] is not None else ""
+    print(f"  TRACE {trace['method']} x{trace['calls']} sent={trace['sent']}B received={trace['received']}B {phases}{error}")
@@ -0,0 +1,233 @@
+"""
+Local SQLite mirror of projects, categories, tasks and external links.
+
+The first sync of a project downloads everything. Later syncs only ask
+Kanboard for tasks modified since the project's high-water mark (the
+newest date_modification seen) through searchTasks, and refresh the
+external links of just those tasks in one batch. Removed tasks cannot be
+seen that way: our own removeTask calls delete them from the mirror, and a
+full sync (sync(full=True)) reconciles everything else. Categories and
+tasks we create are written in right away, the next sync replaces them
+with the full records.
+
+Rows are stored with their full JSON so reads return the same dicts as the
+API, next to indexed columns for lookups by project, name and title.
+"""
+import datetime
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS categories_name ON categories (project_id, name);
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    project_id INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    is_active INTEGER NOT NULL,
+    date_modification INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_title ON tasks (project_id, title);
+CREATE INDEX IF NOT EXISTS tasks_active ON tasks (project_id, is_active);
+CREATE TABLE IF NOT EXISTS external_links (
+    id INTEGER PRIMARY KEY,
+    task_id INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS external_links_task ON external_links (task_id);
+CREATE TABLE IF NOT EXISTS sync_state (
+    project_id INTEGER PRIMARY KEY,
+    high_water INTEGER NOT NULL,
+    synced_at INTEGER NOT NULL
+);
+"""
+
+DAY = 86400
+
+
+def _int(value):
+    if value is None or value == "":
+        return 0
+    return int(value)
+
+
+def _rows(cursor):
+    return [json.loads(data) for (data,) in cursor]
+
+
+class Mirror:
+    """
+    path: SQLite file, created on first use
+    api: APIConnector, used by sync() only (call and stream)
+    new_batch: returns an RPCBatch, used by sync() for external links
+    """
+
+    def __init__(self, path, api=None, new_batch=None):
+        self.path = path
+        self.api = api
+        self.new_batch = new_batch
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self._lock = threading.RLock()
+
+    def close(self):
+        self.db.close()
+
+    # Reads, same shapes as the RPC wrappers
+    def getAllProjects(self):
+        with self._lock:
+            return _rows(self.db.execute("SELECT data FROM projects ORDER BY id"))
+
+    def getAllCategories(self, project_id):
+        with self._lock:
+            return _rows(self.db.execute("SELECT data FROM categories WHERE project_id = ? ORDER BY id", (project_id,)))
+
+    def getCategoryByName(self, project_id, name):
+        with self._lock:
+            found = _rows(self.db.execute(
+                "SELECT data FROM categories WHERE project_id = ? AND name = ? ORDER BY id LIMIT 1", (project_id, name)))
+        return found[0] if found else None
+
+    def getAllTasks(self, project_id, status_id=1):
+        with self._lock:
+            return _rows(self.db.execute(
+                "SELECT data FROM tasks WHERE project_id = ? AND is_active = ? ORDER BY id", (project_id, status_id)))
+
+    def getTaskByName(self, project_id, title, status_id=1):
+        with self._lock:
+            return _rows(self.db.execute(
+                "SELECT data FROM tasks WHERE project_id = ? AND title = ? AND is_active = ? ORDER BY id",
+                (project_id, title, status_id)))
+
+    def getAllExternalTaskLinks(self, task_id):
+        with self._lock:
+            return _rows(self.db.execute("SELECT data FROM external_links WHERE task_id = ? ORDER BY id", (task_id,)))
+
+    def highWater(self, project_id):
+        with self._lock:
+            row = self.db.execute("SELECT high_water FROM sync_state WHERE project_id = ?", (project_id,)).fetchone()
+        return row[0] if row else None
+
+    # Writes
+    def putCategory(self, category):
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO categories VALUES (?, ?, ?, ?)",
+                (_int(category["id"]), _int(category["project_id"]), category["name"], json.dumps(category)),
+            )
+
+    def putTask(self, task):
+        # A just created task, modified now until the next sync says otherwise
+        task = dict(task)
+        task.setdefault("date_modification", int(time.time()))
+        with self._lock, self.db:
+            self._putTasks([task])
+
+    def removeTask(self, task_id):
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            self.db.execute("DELETE FROM external_links WHERE task_id = ?", (task_id,))
+
+    def _putTasks(self, tasks):
+        # Returns (ids, newest date_modification)
+        ids = []
+        newest = 0
+        rows = []
+        for task in tasks:
+            modified = _int(task.get("date_modification"))
+            newest = max(newest, modified)
+            ids.append(_int(task["id"]))
+            rows.append((ids[-1], _int(task["project_id"]), task["title"], _int(task.get("is_active")), modified, json.dumps(task)))
+        self.db.executemany("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return ids, newest
+
+    def _putLinks(self, links_by_task):
+        for task_id, links in links_by_task.items():
+            self.db.execute("DELETE FROM external_links WHERE task_id = ?", (task_id,))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO external_links VALUES (?, ?, ?)",
+                [(_int(link["id"]), task_id, json.dumps(link)) for link in links or []],
+            )
+
+    def _fetchLinks(self, task_ids):
+        if not task_ids:
+            return {}
+        with self.new_batch() as batch:
+            calls = [batch.add("getAllExternalTaskLinks", {"task_id": task_id}) for task_id in task_ids]
+        return {call.params["task_id"]: call.get() for call in calls}
+
+    def _stream(self, method, params):
+        return self.api.stream(json.dumps({"jsonrpc": "2.0", "method": method, "id": 1, "params": params}), method)
+
+    def syncProject(self, project_id, full=False):
+        # Returns the number of tasks that were written
+        high_water = None if full else self.highWater(project_id)
+        categories = self.api.call("getAllCategories", {"project_id": project_id}) or []
+
+        if high_water is None:
+            tasks = []
+            for status_id in (1, 0):
+                tasks.extend(self._stream("getAllTasks", {"project_id": project_id, "status_id": status_id}))
+        else:
+            # Kanboard filters on whole days, so ask from the day before the
+            # mark and let INSERT OR REPLACE absorb the overlap
+            since = datetime.datetime.fromtimestamp(high_water - DAY, datetime.timezone.utc).strftime("%Y-%m-%d")
+            tasks = [
+                task for task in self._stream("searchTasks", {"project_id": project_id, "query": f"modified:>={since}"})
+                if _int(task.get("date_modification")) >= high_water
+            ]
+        links = self._fetchLinks([_int(task["id"]) for task in tasks])
+
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM categories WHERE project_id = ?", (project_id,))
+            self.db.executemany(
+                "INSERT OR REPLACE INTO categories VALUES (?, ?, ?, ?)",
+                [(_int(c["id"]), project_id, c["name"], json.dumps(c)) for c in categories],
+            )
+            ids, newest = self._putTasks(tasks)
+            if high_water is None:
+                # Full load: whatever was not returned has been removed
+                self.db.execute("CREATE TEMP TABLE IF NOT EXISTS seen (id INTEGER PRIMARY KEY)")
+                self.db.execute("DELETE FROM seen")
+                self.db.executemany("INSERT INTO seen VALUES (?)", [(i,) for i in ids])
+                self.db.execute(
+                    "DELETE FROM external_links WHERE task_id IN "
+                    "(SELECT id FROM tasks WHERE project_id = ? AND id NOT IN (SELECT id FROM seen))", (project_id,))
+                self.db.execute("DELETE FROM tasks WHERE project_id = ? AND id NOT IN (SELECT id FROM seen)", (project_id,))
+            self._putLinks(links)
+            self.db.execute(
+                "INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)",
+                (project_id, max(newest, high_water or 0), int(time.time())),
+            )
+        return len(tasks)
+
+    def sync(self, full=False, project_ids=None):
+        # Returns {project_id: tasks written}
+        projects = self.api.call("getAllProjects") or []
+        with self._lock, self.db:
+            self.db.execute("DELETE FROM projects")
+            self.db.executemany(
+                "INSERT OR REPLACE INTO projects VALUES (?, ?, ?)",
+                [(_int(p["id"]), p["name"], json.dumps(p)) for p in projects],
+            )
+            known = [_int(p["id"]) for p in projects]
+            placeholders = ",".join("?" * len(known)) or "NULL"
+            for table in ("categories", "tasks", "sync_state"):
+                self.db.execute(f"DELETE FROM {table} WHERE project_id NOT IN ({placeholders})", known)
+            self.db.execute("DELETE FROM external_links WHERE task_id NOT IN (SELECT id FROM tasks)")
+        if project_ids is None:
+            project_ids = known
+        return {project_id: self.syncProject(project_id, full) for project_id in project_ids}
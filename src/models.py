@@ -0,0 +1,185 @@
+"""
+Compact records for Kanboard tasks, projects and categories.
+
+The classes use __slots__ instead of a per instance __dict__, so a task costs
+a fixed size object plus its values instead of a dict with one entry per
+field; that is what lets reports keep hundreds of thousands of tasks in
+memory. fromRPC() builds a record straight from a getAllTasks /
+getAllProjects / getAllCategories row, converting Kanboard's numeric
+strings to ints and interning repeated strings.
+"""
+import datetime
+import json
+import sys
+
+dttm = datetime.datetime.now().replace(microsecond=0).isoformat()
+
+_encode_str = json.encoder.encode_basestring_ascii
+
+
+def _int(value, default=0):
+    if value is None or value == "":
+        return default
+    return int(value)
+
+
+def _str(value, default=""):
+    return default if value is None else value
+
+
+def _istr(value, default=""):
+    # Small strings that repeat across rows (colors, references)
+    return default if value is None else sys.intern(value)
+
+
+def _encode(value):
+    if value is None:
+        return "null"
+    if isinstance(value, str):
+        return _encode_str(value)
+    if isinstance(value, bool) or not isinstance(value, int):
+        return json.dumps(value)
+    return str(value)
+
+
+class Record:
+    __slots__ = ()
+    # (name, default, convert) for every slot, set by subclasses
+    FIELDS = ()
+
+    def __init__(self, **kwargs):
+        for name, default, convert in self.FIELDS:
+            setattr(self, name, kwargs.pop(name, default))
+        if kwargs:
+            raise TypeError(f"{type(self).__name__} got unexpected fields {', '.join(kwargs)}")
+
+    @classmethod
+    def fromRPC(cls, row):
+        record = cls.__new__(cls)
+        get = row.get
+        for name, default, convert in cls.FIELDS:
+            setattr(record, name, convert(get(name), default))
+        return record
+
+    @classmethod
+    def listFromRPC(cls, rows):
+        # rows may be a generator, e.g. iterAllTasks, so no dict list is kept
+        return [cls.fromRPC(row) for row in rows or ()]
+
+    def toDict(self):
+        return {name: getattr(self, name) for name, default, convert in self.FIELDS}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name, default, convert in self.FIELDS)
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name, default, convert in self.FIELDS)
+        return f"{type(self).__name__}({fields})"
+
+
+class ExtLinkType:
+    Auto = "auto"
+    Attachment = "attachment"
+    File = "file"
+    Web = "weblink"
+
+
+def _tags(value, default):
+    # Rows without tags share one empty tuple instead of a list each
+    return list(value) if value else ()
+
+
+class Task(Record):
+    FIELDS = (
+        ("id", 0, _int),
+        ("title", "", _str),
+        ("project_id", 0, _int),
+        ("color_id", "green", _istr),
+        ("column_id", 1, _int),
+        ("owner_id", 1, _int),
+        ("creator_id", 1, _int),
+        ("due_date", None, _str),
+        ("description", "", _str),
+        ("category_id", 0, _int),
+        ("score", 0, _int),
+        ("swimlane_id", 1, _int),
+        ("priority", 0, _int),
+        ("recurrence_status", 0, _int),
+        ("recurrence_trigger", 0, _int),
+        ("recurrence_factor", 0, _int),
+        ("recurrence_timeframe", 0, _int),
+        ("recurrence_basedate", None, _str),
+        ("reference", "", _istr),
+        ("tags", None, _tags),
+        ("date_started", str(dttm), _str),
+        # Only filled from RPC results, unix timestamps
+        ("date_creation", 0, _int),
+        ("date_modification", 0, _int),
+        ("date_completed", 0, _int),
+        ("date_due", 0, _int),
+        ("is_active", 1, _int),
+        ("position", 0, _int),
+    )
+    __slots__ = tuple(name for name, default, convert in FIELDS)
+
+    # Sent by createTask, in this order. The other fields are not sent
+    # yet: color_id, due_date (ISO8601), score, priority, recurrence_*,
+    # date_started (ISO8601)
+    CREATE_FIELDS = (
+        "title",            # (string, required)
+        "project_id",       # (integer, required)
+        "column_id",        # (integer, optional)
+        "owner_id",         # (integer, optional)
+        "creator_id",       # (integer, optional)
+        "description",      # Markdown content (string, optional)
+        "category_id",      # (integer, optional)
+        "swimlane_id",      # (integer, optional)
+        "reference",        # (string, optional)
+        "tags",             # ([]string, optional)
+    )
+    _CREATE_KEYS = tuple(_encode_str(name) + ":" for name in CREATE_FIELDS)
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        # Initialize the tags attribute as an empty list if not provided
+        self.tags = list(self.tags) if self.tags else []
+
+    def params(self):
+        params = {name: getattr(self, name) for name in self.CREATE_FIELDS}
+        params["tags"] = list(self.tags)
+        return params
+
+    def paramsJSON(self):
+        # createTask params encoded straight from the slots
+        return "{" + ",".join(
+            key + (_encode(list(self.tags)) if name == "tags" else _encode(getattr(self, name)))
+            for key, name in zip(self._CREATE_KEYS, self.CREATE_FIELDS)
+        ) + "}"
+
+
+class Project(Record):
+    FIELDS = (
+        ("id", 0, _int),
+        ("name", "", _str),
+        ("identifier", "", _str),
+        ("description", "", _str),
+        ("is_active", 1, _int),
+        ("is_public", 0, _int),
+        ("is_private", 0, _int),
+        ("owner_id", 0, _int),
+        ("last_modified", 0, _int),
+    )
+    __slots__ = tuple(name for name, default, convert in FIELDS)
+
+
+class Category(Record):
+    FIELDS = (
+        ("id", 0, _int),
+        ("name", "", _str),
+        ("project_id", 0, _int),
+        ("description", "", _str),
+        ("color_id", "", _istr),
+    )
+    __slots__ = tuple(name for name, default, convert in FIELDS)
@@ -1,21 +1,24 @@
-import http.client
 import json
 import sys
-import argparse
 import os
-from dotenv import load_dotenv
-import logging
-import tkinter as tk
-from tkinter import ttk
-from dataclasses import dataclass
-import datetime
-import numpy as np
 
-dttm = datetime.datetime.now().replace(microsecond=0).isoformat()
+# With KB_DAEMON_SOCKET set, the command line runs in a warm daemon
+# (-m daemon) when one is listening, see daemon.py
+if __name__ == "__main__" and os.getenv("KB_DAEMON_SOCKET"):
+    from daemon import forward
+    forward(sys.argv[1:])
+
+import contextlib
+from apiConnector import APIConnector, configure, currentSettings, newPolicy
+from lookupCache import LookupCache, CATEGORIES, TASKS
 
 # Check if .env file exists in same folder!
 if os.path.isfile(".env"):
-    load_dotenv()
+    # Values already exported (cron jobs) win over .env anyway, so the
+    # python-dotenv import is skipped when both are set
+    if not (os.getenv("KB_SITE") and os.getenv("KB_TOKEN")):
+        from dotenv import load_dotenv
+        load_dotenv()
     KB_SITE=os.getenv("KB_SITE")
     KB_TOKEN=os.getenv("KB_TOKEN")
 else:
@@ -33,47 +36,114 @@ if KB_SITE == "" or KB_SITE == None or KB_TOKEN == "" or KB_TOKEN == None:
     print("  -- KB_TOKEN=<kanboard-token>")
     sys.exit(1)
 
+# Projects selectAProject lists at once, typing a name narrows them down
+PICKER_ROWS = 30
+
 _debug = 0
 _method = ""
 _project_id = -1
+_pool_size = int(os.getenv("KB_POOL_SIZE") or 4)
+_timeout = float(os.getenv("KB_TIMEOUT") or 60)
+_rate = float(os.getenv("KB_RATE") or 0)
+_retries = int(os.getenv("KB_RETRIES") or 3)
+_compress_min = int(os.getenv("KB_COMPRESS_MIN") or 0)
+_batch_size = int(os.getenv("KB_BATCH_SIZE") or 50)
+_concurrency = int(os.getenv("KB_CONCURRENCY") or 10)
+configure(site=KB_SITE, token=KB_TOKEN, pool_size=_pool_size, timeout=_timeout, rate=_rate, retries=_retries,
+          compress_min=_compress_min)
 
+# Name lookups are answered from here, see getCategoryByName/getTaskByName
+_cache = LookupCache(ttl=int(os.getenv("KB_CACHE_TTL") or 300))
 
-class APIConnector:
-    def __init__(self):
-        self.conn = http.client.HTTPSConnection(KB_SITE)
-        self.headers = {
-            "Content-Type": "application/json",
-            "Authorization": "Basic " + KB_TOKEN,
-        }
+# Flag defaults, read from the environment once: every command line (the
+# daemon runs many in one process) starts from these, not from the last one
+_flag_defaults = {
+    "pool_size": _pool_size, "rate": _rate, "retries": _retries, "compress_min": _compress_min,
+    "batch_size": _batch_size, "concurrency": _concurrency, "cache_ttl": _cache.ttl,
+}
+
+# getAllProjects/getAllCategories results kept between runs, see responseCache.py
+_response_cache = None
+
+# With --mirror, reads come from the local SQLite mirror, see mirror.py
+_mirror = None
 
-    def callback(self):
-        self.entry.delete(0, tk.END)
 
 def GET_RPC(payload):
     if _debug >0:
       print(f" DEBUG: GET_RPC(PAYLOAD): {payload}")
 
-    # Create an instance of the APIConnector class
+    # Create an instance of the APIConnector class (connections are pooled)
     api = APIConnector()
-    api.conn.request("GET", "/jsonrpc.php", payload, api.headers)
-    res = api.conn.getresponse()
-    data = res.read()
-    rpc_results = json.loads(data)["result"]
+    rpc_results = api.rpc(payload)
     if _debug >0:
       print(rpc_results)
     return rpc_results
 
+def newBatch():
+    # Calls added to the batch go out as JSON-RPC batch arrays on execute()
+    from rpcBatch import RPCBatch
+    return RPCBatch(APIConnector().post, batch_size=_batch_size)
+
+def newAsyncClient():
+    # Coroutine versions of the wrappers below for bulk jobs, see asyncClient.py
+    from asyncClient import AsyncKanboardClient
+    return AsyncKanboardClient(KB_SITE, KB_TOKEN, concurrency=_concurrency, timeout=_timeout,
+                               policy=newPolicy(_concurrency), metrics=APIConnector().metrics,
+                               compress_min=_compress_min)
+
+def openResponseCache(refresh=False):
+    from responseCache import ResponseCache, defaultDirectory
+    return ResponseCache(
+        os.getenv("KB_CACHE_DIR") or defaultDirectory(),
+        KB_SITE,
+        KB_TOKEN,
+        ttl=int(os.getenv("KB_RESPONSE_TTL") or 600),
+        max_bytes=int(os.getenv("KB_CACHE_MB") or 50) * 1024 * 1024,
+        refresh=refresh,
+    )
+
+def forgetCategories(project_id):
+    # Our own category writes make the stored getAllCategories stale
+    if _response_cache is not None:
+        _response_cache.invalidate("getAllCategories", {"project_id": project_id})
+
+def openMirror(path):
+    from mirror import Mirror
+    return Mirror(path, APIConnector(), newBatch)
+
+def newWebhookServer(host, port):
+    # Kanboard's webhook events applied to this process's caches and mirror
+    from webhooks import WebhookReceiver, WebhookServer
+    server = WebhookServer(WebhookReceiver(_cache, _mirror, _response_cache), host, port, os.getenv("KB_WEBHOOK_TOKEN"))
+    print(f"  Webhooks on http://{host}:{server.server_address[1]}/webhook")
+    sys.stdout.flush()
+    return server
+
 def getAllProjects(api):
-    payload = json.dumps({"jsonrpc": "2.0", "method": "getAllProjects", "id": 1})
+    if _mirror is not None:
+        return _mirror.getAllProjects()
+    if _response_cache is not None:
+        hit, all_projects = _response_cache.get("getAllProjects")
+        if hit:
+            return all_projects
 
-    api.conn.request("GET", "/jsonrpc.php", payload, api.headers)
-    res = api.conn.getresponse()
-    data = res.read()
+    payload = json.dumps({"jsonrpc": "2.0", "method": "getAllProjects", "id": 1})
 
-    all_projects = json.loads(data)["result"]
+    all_projects = api.rpc(payload)
 
+    if _response_cache is not None:
+        _response_cache.put("getAllProjects", None, all_projects)
     return all_projects
 
+def iterAllProjects(api): # Generator version of getAllProjects
+    if _mirror is not None:
+        yield from _mirror.getAllProjects()
+        return
+    payload = json.dumps({"jsonrpc": "2.0", "method": "getAllProjects", "id": 1})
+
+    yield from api.stream(payload, "getAllProjects")
+
 def createCategory(project_id, name):
     payload = json.dumps(
         {
@@ -85,6 +155,11 @@ def createCategory(project_id, name):
     )
 
     category = GET_RPC(payload)
+    forgetCategories(project_id)
+    if category:
+        _cache.add(CATEGORIES, project_id, {"id": category, "name": name, "project_id": project_id})
+        if _mirror is not None:
+            _mirror.putCategory({"id": category, "name": name, "project_id": project_id})
     return category
 
 def getCategory(project_id, category_id):
@@ -101,6 +176,12 @@ def getCategory(project_id, category_id):
     return category
 
 def getAllCategories(project_id):
+    if _mirror is not None:
+        return _mirror.getAllCategories(project_id)
+    if _response_cache is not None:
+        hit, all_categories = _response_cache.get("getAllCategories", {"project_id": project_id})
+        if hit:
+            return all_categories
     payload = json.dumps(
         {
             "jsonrpc": "2.0",
@@ -111,8 +192,35 @@ def getAllCategories(project_id):
     )
 
     all_categories = GET_RPC(payload)
+    if _response_cache is not None:
+        _response_cache.put("getAllCategories", {"project_id": project_id}, all_categories)
     return all_categories 
 
+def getCategories(project_id, category_ids): # One batch for many categories
+    with newBatch() as batch:
+        calls = [
+            batch.add("getCategory", {"project_id": project_id, "category_id": category_id})
+            for category_id in category_ids
+        ]
+    return {call.params["category_id"]: call.get() for call in calls}
+
+def getColumns(project_id): # Board columns of a project, in board order
+    payload = json.dumps(
+        {
+            "jsonrpc": "2.0",
+            "method": "getColumns",
+            "id": 1,
+            "params": {"project_id": project_id},
+        }
+    )
+
+    return GET_RPC(payload)
+
+def getAllCategoriesForProjects(project_ids): # One batch for many projects
+    with newBatch() as batch:
+        calls = [batch.add("getAllCategories", {"project_id": project_id}) for project_id in project_ids]
+    return {call.params["project_id"]: call.get() for call in calls}
+
 def getCategoryByName(project_id, category_name):
     #TODO: API Does not support this method:
     # payload = json.dumps(
@@ -127,92 +235,43 @@ def getCategoryByName(project_id, category_name):
     # category = GET_RPC(payload)
     # return category
 
-    # Work Around
-    all_categories = getAllCategories(project_id)
-    for category in all_categories:
-        if _debug > 0:
-          print("Category Name: " + category['name'])
-        if category['name'] == category_name:
-            #print("Category ID: " + str(category['id']))
-            return category
+    if _mirror is not None:
+        return _mirror.getCategoryByName(project_id, category_name)
+
+    # Work Around: index getAllCategories once per project, see lookupCache.py
+    categories = _cache.byName(CATEGORIES, project_id, category_name, lambda: getAllCategories(project_id))
+    if _debug > 0:
+      print("Category Name: " + category_name, "Found:", len(categories))
+    if categories:
+        return categories[0]
 
     return None
 
-# Define a data class with the attributes and default values
-@dataclass
-class ExtLinkType:
-    Auto: str = "auto"
-    Attachment: str = "attachment"
-    File: str = "file"
-    Web: str = "weblink"
-
-@dataclass
-class Task:
-    id: int = 0
-    title: str = ""
-    project_id: int = 0
-    color_id: str = "green"
-    column_id: int = 1
-    owner_id: int = 1
-    creator_id: int = 1
-    due_date: str = None
-    description: str = ""
-    category_id: int = 0
-    score: int = 0
-    swimlane_id: int = 1
-    priority: int = 0
-    recurrence_status: int = 0
-    recurrence_trigger: int = 0
-    recurrence_factor: int = 0
-    recurrence_timeframe: int = 0
-    recurrence_basedate: str = None
-    reference: str = ""
-    tags: np.ndarray = None
-    date_started: str = str(dttm)
-
-    # Initialize the tags attribute as en empty list of not provided
-    def __post_init__(self):
-        if self.tags is None:
-            self.tags = np.empty(0, dtype=str)
+# Task, ExtLinkType, Project and Category live in models.py and are only
+# imported by the code paths that need them, see __getattr__
+def __getattr__(name):
+    if name in ("Task", "ExtLinkType", "Project", "Category"):
+        import models
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Task API
 def createTask(Task):
-    payload = json.dumps(
-        {
-            "jsonrpc": "2.0",
-            "method": "createTask",
-            "id": 1,
-            "params": {
-                "title": Task.title,                                             # (string, required)
-                "project_id": Task.project_id,                                   # (integer, required)
-                #"color_id": Task.color_id,                                       # (string, optional)
-                "column_id": Task.column_id,                                     # (integer, optional)
-                "owner_id": Task.owner_id,                                       # (integer, optional)
-                "creator_id": Task.creator_id,                                   # (integer, optional)
-                #"due_date": Task.due_date,                                       # ISO8601 format (string, optional)
-                "description": Task.description,                                 # Markdown content (string, optional)
-                "category_id": Task.category_id,                                 # (integer, optional)
-                #"score": Task.score,                                             # (integer, optional)
-                "swimlane_id": Task.swimlane_id,                                 # (integer, optional)
-                #"priority": Task.priority,                                       # (integer, optional)
-                #"recurrence_status": Task.recurrence_status,                     # (integer, optional)
-                #"recurrence_trigger": Task.recurrence_trigger,                   # (integer, optional)
-                #"recurrence_factor": Task.recurrence_factor,                     # (integer, optional)
-                #"recurrence_timeframe": Task.recurrence_timeframe,               # (integer, optional)
-                #"recurrence_basedate": Task.recurrence_basedate,                 # (integer, optional)
-                "reference": Task.reference,                                     # (string, optional)
-                "tags": Task.tags,                                               # ([]string, optional)
-                #"date_started": Task.date_started,                               # ISO8601 format (string, optional)
-            },
-        }
-    )
+    # Params are encoded straight from the slots, see models.Task.CREATE_FIELDS
+    payload = '{"jsonrpc": "2.0", "method": "createTask", "id": 1, "params": ' + Task.paramsJSON() + "}"
     print(payload)
     task = GET_RPC(payload)
+    if task:
+        _cache.add(TASKS, Task.project_id, dict(Task.params(), id=task, is_active=1))
+        if _mirror is not None:
+            _mirror.putTask(dict(Task.params(), id=task, is_active=1))
     return task
 
 def getAllTasks(project_id=1, status_id=1): # Get all available tasks
     #status 1 for Active Tasks, 0 for Inactive
     print("Get All Tasks")
+    if _mirror is not None:
+        return _mirror.getAllTasks(project_id, status_id)
     payload = json.dumps(
         {
             "jsonrpc": "2.0",
@@ -225,7 +284,92 @@ def getAllTasks(project_id=1, status_id=1): # Get all available tasks
     all_tasks = GET_RPC(payload)
     return all_tasks
 
-def getTaskByName(project_id, task_name):
+def iterAllTasks(project_id=1, status_id=1): # Generator version of getAllTasks
+    # Tasks are parsed off the socket one by one, so peak memory does not
+    # grow with the project. Stopping early drops the connection.
+    if _mirror is not None:
+        yield from _mirror.getAllTasks(project_id, status_id)
+        return
+    payload = json.dumps(
+        {
+            "jsonrpc": "2.0",
+            "method": "getAllTasks",
+            "id": 1,
+            "params": {"project_id": project_id,"status_id":status_id},
+        }
+    )
+
+    yield from APIConnector().stream(payload, "getAllTasks")
+
+def searchTasks(project_id, query): # Tasks matching a Kanboard filter, e.g. 'title:"Zillow" status:open'
+    payload = json.dumps(
+        {
+            "jsonrpc": "2.0",
+            "method": "searchTasks",
+            "id": 1,
+            "params": {"project_id": project_id, "query": query},
+        }
+    )
+
+    yield from APIConnector().stream(payload, "searchTasks")
+
+def queryTasks(project_id, query, limit=None): # Tasks matching a taskQuery.TaskQuery
+    # Kanboard filters what it can (searchTasks), every task is checked here.
+    # The mirror has no searchTasks, its getAllTasks is local anyway.
+    matches = query.matcher(
+        categories={c["name"]: c["id"] for c in getAllCategories(project_id) or []} if query.category is not None else None,
+        columns={c["title"]: c["id"] for c in getColumns(project_id) or []} if query.column is not None else None,
+    )
+    search = query.search()
+    if search and _mirror is None:
+        tasks = searchTasks(project_id, search)
+    else:
+        tasks = (task for status_id in query.statusIds() for task in iterAllTasks(project_id, status_id))
+    task_list = []
+    for task in tasks:
+        if matches(task):
+            task_list.append(task)
+            # The tag is checked on all candidates at once below
+            if limit is not None and len(task_list) >= limit and query.tag is None:
+                break
+    if query.tag is not None and task_list:
+        task_list = query.tagged(task_list, getTasksTags([int(task["id"]) for task in task_list]))[:limit]
+    return task_list
+
+def getTaskRecords(project_id=1, status_id=1): # getAllTasks as compact models.Task records
+    from models import Task
+    return Task.listFromRPC(iterAllTasks(project_id, status_id))
+
+def findTasks(project_id, predicate, limit=None, status_id=1): # Filter tasks while streaming
+    task_list = []
+    for task in iterAllTasks(project_id, status_id):
+        if predicate(task):
+            task_list.append(task)
+            if limit is not None and len(task_list) >= limit:
+                break
+    return task_list
+
+def fleetFindTasks(project_ids, predicate, status_id=1, workers=None): # findTasks over many projects at once
+    # Yields a fleet.ProjectResult per project, value = matching tasks.
+    # All workers share the connection pool, more workers than --pool_size wait.
+    from fleet import fanOut
+    return fanOut(project_ids, lambda project_id: findTasks(project_id, predicate, status_id=status_id), workers or _pool_size)
+
+def fleetQueryTasks(project_ids, query, workers=None): # queryTasks over many projects at once
+    # Yields a fleet.ProjectResult per project like fleetFindTasks, but a
+    # selective query only transfers the matching tasks of every project
+    from fleet import fanOut
+    return fanOut(project_ids, lambda project_id: queryTasks(project_id, query), workers or _pool_size)
+
+def getAllTasksForProjects(project_ids, status_id=1): # One batch for many projects
+    with newBatch() as batch:
+        calls = [
+            batch.add("getAllTasks", {"project_id": project_id, "status_id": status_id})
+            for project_id in project_ids
+        ]
+    return {call.params["project_id"]: call.get() for call in calls}
+
+def getTaskByName(project_id, task_name, limit=None, status="all"):
     #TODO: API Does not support this method:
     # payload = json.dumps(
     #     {
@@ -239,16 +383,18 @@ def getTaskByName(project_id, task_name):
     # task = GET_RPC(payload)
     # return task 
     
-    # Work Around
-    task_list = []
-    all_tasks = getAllTasks(project_id)
-    for task in all_tasks:
-        if _debug > 0:
-          print(f"Task Name: ",task['title']," ID: ",task['id'])
-        if task['title'] == task_name:
-            print("Task ID: " + str(task['id']), "  Task Name: " + task['title'])
-            task_list.append(task)
-        #    return task
+    # Work Around: Kanboard searches the title (searchTasks), the exact
+    # title is checked here. status is "open", "closed" or "all"; open tasks
+    # come from the lookup cache when it has the project loaded already.
+    from taskQuery import TaskQuery
+    query = TaskQuery(title=task_name, status=status)
+    index = _cache.loaded(TASKS, project_id) if status == "open" else None
+    if _mirror is not None:
+        task_list = [task for status_id in query.statusIds() for task in _mirror.getTaskByName(project_id, task_name, status_id)][:limit]
+    elif index is not None:
+        task_list = list(index.by_name.get(task_name, []))[:limit]
+    else:
+        task_list = queryTasks(project_id, query, limit)
     for task in task_list:
         print("Task ID: " + str(task['id']), "  Task Name: " + task['title'])
     
@@ -265,8 +411,33 @@ def remoteTask(task_id): # Remove a task
     )
 
     task = GET_RPC(payload)
+    if task:
+        _cache.remove(TASKS, task_id)
+        if _mirror is not None:
+            _mirror.removeTask(task_id)
     return task
 
+def removeTasks(task_ids): # Remove many tasks in batches
+    # Returns {task_id: BatchCall}, check call.error for the ones that failed
+    with newBatch() as batch:
+        calls = [batch.add("removeTask", {"task_id": task_id}) for task_id in task_ids]
+    for call in calls:
+        if call.result:
+            _cache.remove(TASKS, call.params["task_id"])
+            if _mirror is not None:
+                _mirror.removeTask(call.params["task_id"])
+    return {call.params["task_id"]: call for call in calls}
+
+def getTasksTags(task_ids): # One batch of getTaskTags, {task_id: [tag names]}
+    with newBatch() as batch:
+        calls = [batch.add("getTaskTags", {"task_id": task_id}) for task_id in task_ids]
+    tags = {}
+    for call in calls:
+        tag_map = call.get()
+        # PHP sends an empty tag map as []
+        tags[call.params["task_id"]] = list(tag_map.values()) if isinstance(tag_map, dict) else []
+    return tags
+
 def createExternalTaskLink(project_id, task_id, url, dependency, type, title):
     payload = json.dumps(
         {
@@ -278,8 +449,8 @@ def createExternalTaskLink(project_id, task_id, url, dependency, type, title):
                 "task_id": task_id,                 # (integer, required)
                 "url": url,                         # (string, required)
                 "dependency": dependency,           # (string, required)
-                "link_type": type,                       # (string, optional)
-                #"title": title,                     # (string, optional)
+                "link_type": type,                  # (string, optional)
+                "title": title,                     # (string, optional)
             },
         }
     )
@@ -308,6 +479,32 @@ def updateExternalTaskLink(project_id, task_id, link_id, title):
     return upExtTaskLink
 
 
+def companyTaskParams(company, project_id, category_id):
+    from models import Task
+    return Task(title=company.name,project_id=project_id,description=company.name,category_id=category_id,tags=company.tags).params()
+
+def newOnboarding(): # Batched new company flow, see onboarding.py
+    from models import ExtLinkType
+    from onboarding import Onboarding
+    # With --mirror, categories that turn out to exist are looked up in Kanboard
+    return Onboarding(newBatch, _cache, getAllCategories, companyTaskParams, link_type=ExtLinkType.Web,
+                      forget_categories=forgetCategories,
+                      refetch_categories=lambda project_id: APIConnector().call("getAllCategories", {"project_id": project_id}),
+                      mirror=_mirror)
+
+
+def pickProject(all_projects, project_id):
+    # -p given: look the project up by id, otherwise ask
+    if project_id > -1:
+        for project in all_projects:
+            if int(project["id"]) == project_id:
+                return project
+        print(f"  Project ID:{project_id} not found")
+        sys.exit(1)
+    print("  Select a Project:")
+    return selectAProject(all_projects)
+
+
 def promptForInput(prompt_text):
     input_loop = True
     while input_loop:
@@ -320,19 +517,31 @@ def promptForInput(prompt_text):
             return user_input
 
 def selectAProject(all_projects):
+    # Typing part of a name narrows the list down (searchIndex.py), a number selects
+    from searchIndex import SearchIndex
+    index = SearchIndex((i, project["name"]) for i, project in enumerate(all_projects))
+    shown = list(range(len(all_projects)))
     loop = True
     while loop:
-        for i, project in enumerate(all_projects):
-            print("  " + str(i) + ". " + project["name"])
+        for i in shown[:PICKER_ROWS]:
+            print("  " + str(i) + ". " + all_projects[i]["name"])
+        if len(shown) > PICKER_ROWS:
+            print(f"  ... {len(shown) - PICKER_ROWS} more, type part of a name to narrow down")
 
         print("\n")
         print(f"  Select a Project:")
-        user_input = input("  Enter number (x to exit): ")
+        user_input = input("  Enter number or name (x to exit): ")
 
         if user_input == "x":
             print(f"  User Entered:{user_input}\n", "...Exiting...")
             loop = False
 
+        elif not user_input.strip().isdigit():
+            shown = index.search(user_input, limit=None) if user_input.strip() else list(range(len(all_projects)))
+            if not shown:
+                print(f"  No project matches:{user_input}, try again.")
+                shown = list(range(len(all_projects)))
+
         else:
             try:
                 num = int(user_input)
@@ -349,7 +558,7 @@ def selectAProject(all_projects):
                     )
 
                 return selected_project
-            except ValueError:
+            except (ValueError, IndexError):
                 print(f"  Invalid Entry:{user_input}, try again.")
 
     sys.exit(0)
@@ -372,30 +581,30 @@ def function():
     pass
 
 
-# Treeview sort column variable
-default_sort_column = "one"
-
+def main(argv=None):
+    # One command line; the daemon calls this once per forwarded command
+    with contextlib.ExitStack() as cleanup:
+        _main(argv, cleanup)
 
-def sort_column(tv, col, reverse):
-    l = [(tv.set(k, col), k) for k in tv.get_children("")]
-    l.sort(reverse=reverse)
+def _saveSettings():
+    return (_pool_size, _rate, _retries, _compress_min, _batch_size, _concurrency, _cache.ttl, currentSettings())
 
-    # rearrange items in sorted positions
-    for index, (val, k) in enumerate(l):
-        tv.move(k, "", index)
+def _restoreSettings(saved):
+    global _pool_size, _rate, _retries, _compress_min, _batch_size, _concurrency
+    _pool_size, _rate, _retries, _compress_min, _batch_size, _concurrency, _cache.ttl, connector = saved
+    configure(**connector)
 
-    # set sort column binding
-    tv.heading(col, command=lambda: sort_column(tv, col, not reverse))
+def _main(argv, cleanup):
+    global _debug, _method, _project_id, _pool_size, _rate, _retries, _compress_min, _batch_size, _concurrency
+    global _response_cache, _mirror
+    import argparse
+    _debug = 0
+    _project_id = -1
+    _response_cache = None
+    _mirror = None
+    # The flags below only last for this command
+    cleanup.callback(_restoreSettings, _saveSettings())
 
-
-def callback(event):
-    selection = combobox.get()
-
-
-#  entry.delete(0, tk.END)
-#  entry.insert(0, selection)
-
-if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Kan Board API Client")
     parser.add_argument("-d", "--debug", default=0, help="Enable debug output", type=int)
     parser.add_argument("-m", "--method", default="", help="API Method", type=str)
@@ -406,7 +615,47 @@ if __name__ == "__main__":
         "-v", "--version", help="Show version and exit", action="store_true"
     )
     parser.add_argument("-g", "--gui", help="Run GUI", action="store_true")
-    args = parser.parse_args()
+    parser.add_argument("-f", "--file", help="gp: onboard every 'company,url' row of this file, import: CSV/JSONL file to import", type=str)
+    parser.add_argument("--mirror", default=os.getenv("KB_MIRROR"), help="Read from this SQLite mirror file instead of Kanboard, -m sync refreshes it", type=str)
+    parser.add_argument("--full", help="sync: full reload instead of changes since the last sync", action="store_true")
+    parser.add_argument("--checkpoint", help="import: progress file, default <file>.checkpoint", type=str)
+    parser.add_argument("--title", help="fleet: find tasks with exactly this title in every project, remove: title or pattern with * and ?", type=str)
+    parser.add_argument("--contains", help="fleet/remove: tasks whose title contains this text", type=str)
+    parser.add_argument("--closed", help="fleet/remove: closed instead of open tasks", action="store_true")
+    parser.add_argument("--category", help="remove: tasks in this category", type=str)
+    parser.add_argument("--tag", help="remove: tasks with this tag", type=str)
+    parser.add_argument("--older_than", help="remove: tasks not modified for this many days", type=float)
+    parser.add_argument("--duplicates", help="remove: keep the oldest task of every title, remove the rest", action="store_true")
+    parser.add_argument("--yes", help="remove: remove the selected tasks instead of only printing the plan", action="store_true")
+    parser.add_argument("--journal", help="remove: progress file, a rerun skips the tasks removed already, default remove-<project id>.journal", type=str)
+    parser.add_argument("--workers", help="fleet/remove: projects or batches at once, raises --pool_size to match, default --pool_size", type=int)
+    parser.add_argument("--host", default="127.0.0.1", help="web/webhook: address to listen on", type=str)
+    parser.add_argument("--port", default=int(os.getenv("KB_GATEWAY_PORT") or 8080), help="web/webhook: port to listen on", type=int)
+    parser.add_argument("--webhook", help="daemon: also apply Kanboard webhook events posted to --host/--port", action="store_true")
+    parser.add_argument("--web_ttl", default=int(os.getenv("KB_GATEWAY_TTL") or 60), help="web: seconds read results are shared, 0 only coalesces", type=int)
+    parser.add_argument("--pool_size", default=_flag_defaults["pool_size"], help="Max open connections to Kanboard", type=int)
+    parser.add_argument("--no-cache", "--no_cache", dest="no_cache", help="Do not use the on-disk response cache", action="store_true")
+    parser.add_argument("--refresh", help="Refetch instead of reading the response cache, results are still stored", action="store_true")
+    parser.add_argument("--rate", default=_flag_defaults["rate"], help="Max requests per second to Kanboard, 0 for no limit", type=float)
+    parser.add_argument("--retries", default=_flag_defaults["retries"], help="Retries of failed read calls", type=int)
+    parser.add_argument("--compress_min", default=_flag_defaults["compress_min"], help="Gzip request bodies from this many bytes on, 0 never (needs server support)", type=int)
+    parser.add_argument("--metrics", default=os.getenv("KB_METRICS"), help="Write per-method call metrics here on exit: *.json for JSON, - or any other name for Prometheus text", type=str)
+    parser.add_argument("--trace", help="Print one line per Kanboard request with its timings", action="store_true")
+    parser.add_argument("--batch_size", default=_flag_defaults["batch_size"], help="Max calls per JSON-RPC batch request", type=int)
+    parser.add_argument("--concurrency", default=_flag_defaults["concurrency"], help="Max concurrent calls for async bulk jobs", type=int)
+    parser.add_argument("--cache_ttl", default=_flag_defaults["cache_ttl"], help="Seconds name lookups are cached, 0 disables", type=int)
+    args = parser.parse_args(argv)
+    _pool_size = args.pool_size
+    _rate = args.rate
+    _retries = args.retries
+    _compress_min = args.compress_min
+    if args.workers:
+        # Workers beyond the connection pool and its concurrency limit would only queue
+        _pool_size = max(_pool_size, args.workers)
+    configure(pool_size=_pool_size, rate=_rate, retries=_retries, compress_min=_compress_min)
+    _cache.ttl = args.cache_ttl
+    _batch_size = args.batch_size
+    _concurrency = args.concurrency
 
     if args.debug:
         if args.debug > 0:
@@ -441,125 +690,174 @@ if __name__ == "__main__":
     if args.name:
         print("Project Name:", args.name)
 
+    if not args.no_cache:
+        _response_cache = openResponseCache(args.refresh)
+
     # print(type(args.project_id), args.project_id)
+    if args.mirror and _method != "sync":
+        _mirror = openMirror(args.mirror)
+        cleanup.callback(_mirror.close)
     api = APIConnector()
-    all_projects = getAllProjects(api)
-
-    if args.gui:
-        root = tk.Tk()
-        root.title("Kan Board API Client")
-        root.geometry("800x600")
-        tree = ttk.Treeview(root)
-        tree["columns"] = ("one", "two")
-        tree.column("#0", width=270, minwidth=270, stretch=tk.NO)
-        tree.column("one", width=150, minwidth=150, stretch=tk.NO)
-        tree.column("two", width=400, minwidth=200)
-
-        tree.heading("#0", text="Project ID", anchor=tk.W)
-        tree.heading("one", text="Name", anchor=tk.W)
-
-        for project in all_projects:
-            tree.insert("", tk.END, text=project["id"], values=(project["name"]))
-
-        tree.pack(pady=20)
-
-        # Set sort to Project ID on startup
-        sort_column(tree, default_sort_column, False)
-        # Bind left click to sort
-        tree.bind(
-            "<Button-1>",
-            lambda evt: sort_column(tree, tree.identify_column(evt.x), False),
-        )
-
-        project_var = tk.StringVar(root)
-        project_var.set(all_projects[0]["name"])
-
-        option_menu = tk.OptionMenu(root, project_var, *all_projects)
-        option_menu.pack()
-
-        button = tk.Button(
-            root, text="Select A Project", command=lambda: selectAProject(all_projects)
-        )
-        button.pack()
-
-        combobox = ttk.Combobox(root, values=all_projects)
-        combobox.pack(pady=10)
-        combobox.bind("<<ComboboxSelected>>", callback)
-
-        project_cb = ttk.Combobox(root, values=[p["name"] for p in all_projects])
-        project_cb.pack()
-
-        # Table
-        table = ttk.Treeview(root)
-
-        table["columns"] = ("id", "name")
-        table.column("#0", width=0, stretch=tk.NO)
-        table.column("id", anchor="center", width=80)
-        table.column("name", anchor="center", width=80)
-
-        table.heading("id", text="ID", anchor="center")
-        table.heading("name", text="Task", anchor="center")
-
-        table.pack()
-
-        project_label = ttk.Label(root, text="Project:")
-        project_label.pack()
-
-        def on_project_change(event):
-            selected_project = project_cb.get()
-            project_label.config(text="Project: " + selected_project)
-            for project in all_projects:
-                if project["name"] == selected_project:
-                    table.delete(*table.get_children())
-                    # for task in project['tasks']:
-                    #    table.insert('', 'end', values=(task['id'], task['name']))
-                    break
-
-        project_cb.bind("<<ComboboxSelected>>", on_project_change)
-        root.mainloop()
+    if args.trace:
+        from metrics import printTrace
+        api.metrics.addHook(printTrace)
+        cleanup.callback(api.metrics.hooks.remove, printTrace)
+    if args.metrics:
+        cleanup.callback(api.metrics.write, args.metrics)
+
+    if _method == "daemon":
+        # Serve command lines on KB_DAEMON_SOCKET with this process kept warm
+        from daemon import serve
+        if args.webhook:
+            import threading
+            threading.Thread(target=newWebhookServer(args.host, args.port).serve_forever, daemon=True).start()
+        serve(main)
+    elif _method == "web":
+        # Shared, coalescing gateway in front of Kanboard, see webGateway.py
+        import asyncio
+        from webGateway import serveGateway
+        from webhooks import WebhookReceiver
+        try:
+            asyncio.run(serveGateway(newAsyncClient(), args.host, args.port, args.web_ttl, os.getenv("KB_GATEWAY_TOKEN"),
+                                     WebhookReceiver(_cache, _mirror, _response_cache), os.getenv("KB_WEBHOOK_TOKEN")))
+        except KeyboardInterrupt:
+            pass
+    elif _method == "webhook":
+        # Keep the mirror and response cache current from Kanboard's webhooks, see webhooks.py
+        server = newWebhookServer(args.host, args.port)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+    elif args.gui:
+        # Projects are loaded on a worker thread once the window is up
+        from gui import runGUI
+        runGUI(lambda: getAllProjects(api), selectAProject, iterAllTasks)
     else:
+        all_projects = getAllProjects(api)
         print(f"  RUN Method:{_method}")
         if _method == "test":
             #extTaskLink = createExternalTaskLink(1,303,"https://zillow.com/careers","related","weblink","careers")
             #print(extTaskLink)
             #test = updateExternalTaskLink(1,305,336,"Career Site")
             test = getTaskByName(1,"Zillow")
-            for task in test:
-                #print(task)
-                print(f"  Task ID:{task['id']}")
-                rm_tsk = remoteTask(task['id'])
-        if _method == "gp":
+            for task_id, rm_tsk in removeTasks([task['id'] for task in test]).items():
+                print(f"  Task ID:{task_id}", rm_tsk.error or rm_tsk.result)
+        if _method == "import":
+            if not args.file:
+                print("  import needs -f <file.csv|file.jsonl>")
+                sys.exit(1)
+            selected_project = pickProject(all_projects, _project_id)
+            _project_id = int(selected_project["id"])
+            print(f"  Project ID:{_project_id}")
+            print(f"  Project Name:{selected_project['name']}")
+            from companyImport import importCompanies
+            # One upfront fetch of the existing tasks for de-duplication
+            task_titles = _cache.index(TASKS, _project_id, lambda: iterAllTasks(_project_id)).by_name
+            stats = importCompanies(args.file, _project_id, newOnboarding(), task_titles,
+                                    batch_size=_batch_size, workers=_pool_size, checkpoint_path=args.checkpoint)
+            print(f"  Imported:{stats['imported']}  Skipped:{stats['skipped']}  Failed:{stats['failed']}")
+        if _method == "sync":
+            mirror = openMirror(args.mirror or "kanboard-mirror.db")
+            project_ids = [_project_id] if _project_id > -1 else None
+            for project_id, written in mirror.sync(full=args.full, project_ids=project_ids).items():
+                print(f"  Project ID:{project_id}  Tasks synced:{written}")
+            mirror.close()
+        if _method == "report":
+            # Board-health report from a columnar snapshot, see analytics.py
+            from analytics import TaskColumns, printReport
             if _project_id > -1:
-                selected_project = all_projects[_project_id]
+                project_ids = [_project_id]
             else:
-                print("  Select a Project:")
-                selected_project = selectAProject(all_projects)
-                _project_id = selected_project["id"]
+                project_ids = [int(p["id"]) for p in all_projects]
+            snapshot = TaskColumns.fromRows(task for project_id in project_ids for task in iterAllTasks(project_id))
+            printReport(snapshot, {int(p["id"]): p["name"] for p in all_projects})
+        if _method == "fleet":
+            # Fan out over every project (or -p) and print matches as projects finish
+            from taskQuery import TaskQuery
+            if not (args.title or args.contains):
+                print("  fleet needs --title <task title> or --contains <text>")
+                sys.exit(1)
+            query = TaskQuery(title=args.title, contains=None if args.title else args.contains,
+                              status="closed" if args.closed else "open")
+            names = {int(p["id"]): p["name"] for p in all_projects}
+            project_ids = [_project_id] if _project_id > -1 else list(names)
+            matches = failed = 0
+            for result in fleetQueryTasks(project_ids, query, workers=args.workers):
+                name = names.get(result.project_id, "")
+                if result.error is not None:
+                    failed += 1
+                    print(f"  FAILED Project ID:{result.project_id} {name}: {result.error}")
+                    continue
+                matches += len(result.value)
+                for task in result.value:
+                    print(f"  Project ID:{result.project_id} {name}  Task ID:{task['id']}  Task Name:{task['title']}")
+            print(f"  Projects:{len(project_ids) - failed}  Failed:{failed}  Matches:{matches}")
+        if _method == "remove":
+            # Select from one fetch, print the plan, remove only with --yes
+            if not (args.title or args.contains or args.category or args.tag or args.older_than is not None or args.duplicates):
+                print("  remove needs --title, --contains, --category, --tag, --older_than or --duplicates")
+                sys.exit(1)
+            selected_project = pickProject(all_projects, _project_id)
+            _project_id = int(selected_project["id"])
             print(f"  Project ID:{_project_id}")
             print(f"  Project Name:{selected_project['name']}")
-            input_company = promptForInput("  Enter Company Name (x to exit): ")
-            print(f"  Company Name:{input_company}")
-            input_url = promptForInput("  Enter Company URL (x to exit): ")
-            print(f"  Company URL:{input_url}")
-            new_category = createCategory(_project_id, input_company)
-            if new_category == False:
-                print(f"Category already exists:",input_company)
-                new_category = getCategoryByName(_project_id, input_company)
-            
-            print(f"  Category ID:",str(new_category['id']))
-            print(f"  Category Name:",new_category['name'])
-            tsk = Task(title=input_company,project_id=_project_id,description=input_company,category_id=new_category["id"],tags=["Company"])
-            print(tsk)
-
-            new_task = createTask(tsk)
-            print(type(new_task),new_task)
-            #print(f"  Task ID:",str(new_task['id']))
-            # project_id, task_id, url, dependency, type, title
-            print(f"  Task ID:{new_task}")
-            #new_url = input_url.replace('/','\/')
-            #print(new_url)
-            extTaskLink = createExternalTaskLink(_project_id,new_task,input_url,"related",ExtLinkType.Web,"Career Site")
-            print(extTaskLink)
-
-            fixExtTaskLinkTitl= updateExternalTaskLink(_project_id,new_task,extTaskLink,input_company + " Career Site")
-            print(fixExtTaskLinkTitl)
\ No newline at end of file
+            from bulkRemove import Journal, printPlan, removeSelected, selectTasks
+            category_id = None
+            if args.category:
+                category = getCategoryByName(_project_id, args.category)
+                if category is None:
+                    print(f"  No category named {args.category}")
+                    sys.exit(1)
+                category_id = int(category["id"])
+            import time
+            from taskQuery import TaskQuery
+            title = args.title or (f"*{args.contains}*" if args.contains else None)
+            # Kanboard narrows the tasks down (searchTasks), selectTasks checks them exactly.
+            # --duplicates keeps the oldest of every title before the tag is looked at,
+            # so the tag is left to selectTasks then; otherwise queryTasks checked it.
+            older_than = ("<=", time.time() - args.older_than * 86400) if args.older_than is not None else None
+            pushed_tag = None if args.duplicates else args.tag
+            candidates = queryTasks(_project_id, TaskQuery(pattern=title, status="closed" if args.closed else "open",
+                                                           category=args.category, tag=pushed_tag, modified=older_than))
+            selected = selectTasks(candidates, title=title, category_id=category_id, tag=None if pushed_tag else args.tag,
+                                   older_than=args.older_than, duplicates=args.duplicates, fetch_tags=getTasksTags)
+            printPlan(selected, {int(c["id"]): c["name"] for c in getAllCategories(_project_id) or []})
+            if not args.yes:
+                print("  Dry run, nothing removed. Run again with --yes to remove these tasks")
+            elif selected:
+                journal = Journal(args.journal or f"remove-{_project_id}.journal")
+                stats = removeSelected(selected, removeTasks, journal, batch_size=_batch_size, workers=args.workers or _pool_size)
+                print(f"  Removed:{stats['removed']}  Skipped:{stats['skipped']}  Failed:{stats['failed']}")
+        if _method == "gp":
+            selected_project = pickProject(all_projects, _project_id)
+            _project_id = int(selected_project["id"])
+            print(f"  Project ID:{_project_id}")
+            print(f"  Project Name:{selected_project['name']}")
+            from onboarding import Company, readCompanies
+            if args.file:
+                # Non-interactive bulk mode
+                companies = readCompanies(args.file)
+                print(f"  Companies:{len(companies)} from {args.file}")
+            else:
+                input_company = promptForInput("  Enter Company Name (x to exit): ")
+                print(f"  Company Name:{input_company}")
+                input_url = promptForInput("  Enter Company URL (x to exit): ")
+                print(f"  Company URL:{input_url}")
+                companies = [Company(input_company, input_url)]
+
+            # Category, task and titled link for every company, one batch per step
+            failed = 0
+            for company in newOnboarding().run(_project_id, companies):
+                if company.error is not None:
+                    failed += 1
+                    print(f"  FAILED {company.name}: {company.error}")
+                else:
+                    print(f"  {company.name}: Category ID:{company.category_id}  Task ID:{company.task_id}  Link ID:{company.link_id}")
+            print(f"  Onboarded:{len(companies) - failed}  Failed:{failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Pipelined "new company" onboarding.
+
+Adding a company used to cost up to five dependent round trips: create the
+category, look it up again when it already existed, create the task, create
+the external link and then fix the link title. Here every step runs for all
+companies at once as one JSON-RPC batch, existing categories come from the
+lookup cache and the link is created with its title, so onboarding N
+companies takes one category download plus three batches.
+"""
+import csv
+
+from lookupCache import CATEGORIES, TASKS
+
+
+class Company:
+    def __init__(self, name, url, tags=None, link_title=None):
+        self.name = name
+        self.url = url
+        self.tags = list(tags) if tags else ["Company"]
+        self.link_title = link_title or name + " Career Site"
+        self.category_id = None
+        self.task_id = None
+        self.link_id = None
+        self.error = None
+        self.row = None
+
+    def __repr__(self):
+        return (
+            f"Company(name={self.name!r}, category_id={self.category_id}, "
+            f"task_id={self.task_id}, link_id={self.link_id}, error={self.error})"
+        )
+
+
+def readCompanies(path):
+    # One "name,url" row per company, blank lines and "#" comments skipped
+    companies = []
+    with open(path, newline="", encoding="utf-8") as fp:
+        for row in csv.reader(fp):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            name = row[0].strip()
+            url = row[1].strip() if len(row) > 1 else ""
+            companies.append(Company(name, url))
+    return companies
+
+
+class Onboarding:
+    """
+    new_batch: returns an RPCBatch (newCompany.newBatch)
+    cache: the LookupCache shared with the name lookups
+    fetch_categories: project_id -> categories (newCompany.getAllCategories)
+    task_params: (company, project_id, category_id) -> createTask params
+    forget_categories: project_id -> None, called once categories were
+        created, to drop copies of getAllCategories kept elsewhere
+    refetch_categories: project_id -> categories straight from Kanboard,
+        used when createCategory says a category exists that the
+        fetch_categories copy did not have; defaults to fetch_categories
+    mirror: a mirror.Mirror the created categories and tasks are written to
+    """
+
+    def __init__(self, new_batch, cache, fetch_categories, task_params, link_type="weblink", forget_categories=None,
+                 refetch_categories=None, mirror=None):
+        self.new_batch = new_batch
+        self.cache = cache
+        self.fetch_categories = fetch_categories
+        self.task_params = task_params
+        self.link_type = link_type
+        self.forget_categories = forget_categories
+        self.refetch_categories = refetch_categories or fetch_categories
+        self.mirror = mirror
+
+    def _categoryIndex(self, project_id):
+        return self.cache.index(CATEGORIES, project_id, lambda: self.fetch_categories(project_id))
+
+    def preload(self, project_id):
+        # One category download up front, later runs resolve from the index
+        return self._categoryIndex(project_id)
+
+    def _resolveCategories(self, project_id, companies):
+        index = self._categoryIndex(project_id)
+        missing = {}
+        for company in companies:
+            known = index.by_name.get(company.name)
+            if known:
+                company.category_id = known[0]["id"]
+            else:
+                missing.setdefault(company.name, []).append(company)
+        if not missing:
+            return
+
+        with self.new_batch() as batch:
+            calls = [batch.add("createCategory", {"project_id": project_id, "name": name}) for name in missing]
+        if self.forget_categories is not None:
+            self.forget_categories(project_id)
+        raced = []
+        for call in calls:
+            name = call.params["name"]
+            if call.error is None and call.result:
+                category = {"id": call.result, "name": name, "project_id": project_id}
+                self.cache.add(CATEGORIES, project_id, category)
+                if self.mirror is not None:
+                    self.mirror.putCategory(category)
+                for company in missing[name]:
+                    company.category_id = call.result
+            elif call.error is None:
+                # False means it exists after all, someone else created it
+                raced.append(name)
+            else:
+                for company in missing[name]:
+                    company.error = call.error
+
+        if raced:
+            self.cache.invalidate(CATEGORIES, project_id)
+            index = self.cache.index(CATEGORIES, project_id, lambda: self.refetch_categories(project_id))
+            for name in raced:
+                known = index.by_name.get(name)
+                if known and self.mirror is not None:
+                    self.mirror.putCategory(dict(known[0], project_id=project_id))
+                for company in missing[name]:
+                    if known:
+                        company.category_id = known[0]["id"]
+                    else:
+                        company.error = f"Category {name!r} could not be created"
+
+    def run(self, project_id, companies):
+        companies = list(companies)
+        self._resolveCategories(project_id, companies)
+
+        pending = [c for c in companies if c.error is None]
+        with self.new_batch() as batch:
+            calls = [
+                (c, batch.add("createTask", self.task_params(c, project_id, c.category_id)))
+                for c in pending
+            ]
+        for company, call in calls:
+            if call.error is not None or not call.result:
+                company.error = call.error or "createTask returned false"
+                continue
+            company.task_id = call.result
+            task = dict(call.params, id=call.result, is_active=1)
+            self.cache.add(TASKS, project_id, task)
+            if self.mirror is not None:
+                self.mirror.putTask(task)
+
+        pending = [c for c in companies if c.error is None and c.url]
+        with self.new_batch() as batch:
+            calls = [
+                (c, batch.add("createExternalTaskLink", {
+                    "project_id": project_id,
+                    "task_id": c.task_id,
+                    "url": c.url,
+                    "dependency": "related",
+                    "link_type": self.link_type,
+                    "title": c.link_title,
+                }))
+                for c in pending
+            ]
+        for company, call in calls:
+            if call.error is not None or not call.result:
+                company.error = call.error or "createExternalTaskLink returned false"
+            else:
+                company.link_id = call.result
+
+        return companies
@@ -0,0 +1,254 @@
+"""
+Throttling and retries for Kanboard calls.
+
+TokenBucket caps the request rate, failed calls are retried with jittered
+exponential backoff, and AdaptiveLimit lowers the number of calls in
+flight while the server answers slower than usual. RPCPolicy bundles the
+three with per-method settings; APIConnector and the async client send
+every request through one.
+
+Only read-only calls (get*, search*) are retried after the request may
+have reached the server. A write is only sent again when it provably was
+not processed: the connection was refused or the server answered 429.
+"""
+import http.client
+import json
+import random
+import threading
+import time
+
+# HTTP statuses worth another try, the rest (401, 403, 404 ...) fail at once
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+READ_PREFIXES = ("get", "search")
+
+
+class HTTPError(Exception):
+    def __init__(self, status, reason="", retry_after=None):
+        self.status = status
+        self.retry_after = retry_after
+        super().__init__(f"HTTP {status} {reason}".strip())
+
+
+def checkStatus(status, reason="", retry_after=None):
+    if status >= 400:
+        try:
+            retry_after = float(retry_after) if retry_after else None
+        except ValueError:
+            retry_after = None  # HTTP date form, use our own backoff
+        raise HTTPError(status, reason, retry_after)
+
+
+def isReadOnly(methods):
+    return all(method.startswith(READ_PREFIXES) for method in methods)
+
+
+def methodsOf(payload):
+    # Method names of a JSON-RPC payload string, several for a batch
+    request = json.loads(payload)
+    if isinstance(request, list):
+        return [r.get("method", "") for r in request]
+    return [request.get("method", "")]
+
+
+def isRetryable(error, read_only):
+    if isinstance(error, HTTPError):
+        return error.status in RETRY_STATUS if read_only else error.status == 429
+    if isinstance(error, ConnectionRefusedError):
+        return True  # nothing was sent
+    if not read_only:
+        return False
+    # EOFError: asyncio.IncompleteReadError, the response was cut off
+    return isinstance(error, (OSError, EOFError, http.client.HTTPException))
+
+
+def isOverload(error):
+    # Failures that say the server is struggling, not that the call is wrong
+    if isinstance(error, HTTPError):
+        return error.status in RETRY_STATUS
+    return isinstance(error, TimeoutError)
+
+
+def parseMethods(spec):
+    # "getAllTasks:retries=5,rate=2;createTask:retries=0" (KB_METHOD_POLICY)
+    methods = {}
+    for part in (spec or "").split(";"):
+        method, _, settings = part.strip().partition(":")
+        if not method:
+            continue
+        options = methods.setdefault(method, {})
+        for setting in settings.split(","):
+            key, _, value = setting.strip().partition("=")
+            if key:
+                options[key] = float(value)
+    return methods
+
+
+class TokenBucket:
+    """
+    rate: tokens per second, burst: bucket size
+
+    reserve() takes the tokens right away and returns how long the caller
+    has to wait before using them, so threads and coroutines share one
+    bucket and wait in arrival order.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst or rate))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, cost=1):
+        cost = min(cost, self.burst)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= cost
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self, cost=1):
+        wait = self.reserve(cost)
+        if wait:
+            time.sleep(wait)
+
+
+class AdaptiveLimit:
+    """
+    Number of calls allowed in flight, between `minimum` and `maximum`.
+
+    Grows by one per `limit` fast completions and shrinks by `backoff`
+    when a call takes more than `tolerance` times the baseline latency
+    (the fastest recent one) or fails with an overload error. At most one
+    decrease per `limit` completions, so one slow burst does not collapse
+    it to the minimum.
+    """
+
+    def __init__(self, maximum, minimum=1, tolerance=2.0, backoff=0.7):
+        self.maximum = max(1, int(maximum))
+        self.minimum = max(1, min(int(minimum), self.maximum))
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.limit = float(self.maximum)
+        self.baseline = None
+        self.in_flight = 0
+        self._since_decrease = 0
+        self._cond = threading.Condition()
+
+    def tryAcquire(self):
+        with self._cond:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency, overloaded=False):
+        with self._cond:
+            self.in_flight -= 1
+            self._since_decrease += 1
+            if self.baseline is None or latency < self.baseline:
+                self.baseline = latency
+            else:
+                # Let the baseline follow the server if it got slower for good
+                self.baseline += (latency - self.baseline) * 0.01
+            if overloaded or latency > self.tolerance * self.baseline:
+                if self._since_decrease >= int(self.limit):
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._since_decrease = 0
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+
+class MethodPolicy:
+    def __init__(self, retries=3, base=0.5, cap=30.0, rate=None, burst=None):
+        self.retries = int(retries)
+        self.base = base
+        self.cap = cap
+        self.bucket = TokenBucket(rate, burst) if rate else None
+
+    def delay(self, attempt):
+        # Full jitter: anywhere between 0 and the exponential bound
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+
+class RPCPolicy:
+    """
+    rate/burst: requests per second for all calls, None for no limit
+    retries/base/cap: default retry count and backoff bounds in seconds
+    concurrency: upper bound for the AdaptiveLimit, None to disable it
+    methods: {method: {retries, base, cap, rate, burst}} overrides, see
+    parseMethods; a method with its own rate uses its own bucket on top
+    of the shared one
+    """
+
+    def __init__(self, rate=None, burst=None, retries=3, base=0.5, cap=30.0, concurrency=None, methods=None):
+        self.bucket = TokenBucket(rate, burst) if rate else None
+        self.limit = AdaptiveLimit(concurrency) if concurrency else None
+        self.default = MethodPolicy(retries, base, cap)
+        self.methods = {}
+        for method, options in (methods or {}).items():
+            self.configure(method, **options)
+
+    def configure(self, method, **options):
+        settings = {"retries": self.default.retries, "base": self.default.base, "cap": self.default.cap}
+        settings.update(options)
+        self.methods[method] = MethodPolicy(**settings)
+
+    def policyFor(self, methods):
+        # A batch mixing methods falls back to the default settings
+        if len(set(methods)) == 1:
+            return self.methods.get(methods[0], self.default)
+        return self.default
+
+    def waits(self, methods):
+        # Seconds to sleep before sending, tokens are taken right away
+        cost = len(methods)
+        wait = self.bucket.reserve(cost) if self.bucket else 0.0
+        policy = self.policyFor(methods)
+        if policy.bucket is not None:
+            wait = max(wait, policy.bucket.reserve(cost))
+        return wait
+
+    def retryDelay(self, methods, error, attempt):
+        # Seconds to wait before the next attempt, None to give up
+        policy = self.policyFor(methods)
+        if attempt >= policy.retries or not isRetryable(error, isReadOnly(methods)):
+            return None
+        delay = policy.delay(attempt)
+        if isinstance(error, HTTPError) and error.retry_after:
+            delay = max(delay, min(policy.cap, error.retry_after))
+        return delay
+
+    def run(self, methods, send):
+        # Blocking version for the thread based connector
+        attempt = 0
+        while True:
+            wait = self.waits(methods)
+            if wait:
+                time.sleep(wait)
+            if self.limit is not None:
+                self.limit.acquire()
+            start = time.monotonic()
+            try:
+                result = send()
+            except Exception as error:
+                if self.limit is not None:
+                    self.limit.release(time.monotonic() - start, isOverload(error))
+                delay = self.retryDelay(methods, error, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            if self.limit is not None:
+                self.limit.release(time.monotonic() - start)
+            return result
@@ -0,0 +1,113 @@
+"""
+On-disk cache of RPC results that survives between runs.
+
+Entries are keyed by site, token, method and params, so different boards
+or users never see each other's results. Every entry is its own file,
+written to a temporary name and renamed into place, so concurrent runs
+never read half-written entries. A hit touches the file; when the folder
+grows past `max_bytes` the least recently used entries are removed.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+def defaultDirectory():
+    base = os.getenv("XDG_CACHE_HOME") or os.getenv("LOCALAPPDATA") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "kanboard-api")
+
+
+class ResponseCache:
+    """
+    ttl: seconds an entry is served, 0 disables reads and writes
+    refresh: skip reads but still store fresh results (--refresh)
+    """
+
+    def __init__(self, directory, site, token, ttl=600, max_bytes=50 * 1024 * 1024, refresh=False):
+        self.directory = directory
+        self.site = site
+        self.token = token
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+
+    def _path(self, method, params):
+        key = json.dumps([self.site, self.token, method, params], sort_keys=True)
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+    def get(self, method, params=None):
+        # Returns (hit, result)
+        if self.ttl <= 0 or self.refresh:
+            return False, None
+        path = self._path(method, params)
+        try:
+            with open(path, encoding="utf-8") as fp:
+                entry = json.load(fp)
+        except (OSError, ValueError):
+            return False, None
+        if time.time() - entry["stored"] > self.ttl:
+            return False, None
+        try:
+            os.utime(path)  # most recently used
+        except OSError:
+            pass
+        return True, entry["result"]
+
+    def put(self, method, params, result):
+        if self.ttl <= 0:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fp:
+                json.dump({"stored": time.time(), "method": method, "result": result}, fp)
+            os.replace(tmp, self._path(method, params))
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            raise
+        self._evict()
+
+    def invalidate(self, method, params=None):
+        try:
+            os.remove(self._path(method, params))
+        except OSError:
+            pass
+
+    def _evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # removed by another run
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        for mtime, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith((".json", ".tmp")):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except OSError:
+                    pass
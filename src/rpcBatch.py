@@ -0,0 +1,107 @@
+import itertools
+import json
+
+# Request ids are unique for the whole process so that calls from several
+# batches can never be confused with each other
+_ids = itertools.count(1)
+
+
+def nextId():
+    return next(_ids)
+
+
+class RPCError(Exception):
+    def __init__(self, method, error):
+        self.method = method
+        self.code = error.get("code")
+        self.data = error.get("data")
+        super().__init__(f"{method}: {error.get('message')} (code {self.code})")
+
+
+class BatchCall:
+    def __init__(self, method, params=None):
+        self.id = nextId()
+        self.method = method
+        self.params = params
+        self.result = None
+        self.error = None
+        self.done = False
+
+    def request(self):
+        req = {"jsonrpc": "2.0", "method": self.method, "id": self.id}
+        if self.params is not None:
+            req["params"] = self.params
+        return req
+
+    def get(self):
+        if not self.done:
+            raise RuntimeError(f"{self.method} (id {self.id}) has not been executed")
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class RPCBatch:
+    """
+    Collects JSON-RPC calls and sends them as batch arrays, at most
+    `batch_size` calls per HTTP request.
+
+    `send` takes a JSON payload string and returns the decoded response
+    (APIConnector.post). Every add() returns a BatchCall that holds its own
+    result or RPCError once execute() ran.
+
+      with RPCBatch(api.post) as batch:
+          calls = [batch.add("removeTask", {"task_id": t}) for t in task_ids]
+      for call in calls:
+          print(call.params["task_id"], call.error or call.result)
+    """
+
+    def __init__(self, send, batch_size=50):
+        self.send = send
+        self.batch_size = max(1, int(batch_size))
+        self.calls = []
+
+    def __len__(self):
+        return len(self.calls)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.execute()
+
+    def add(self, method, params=None):
+        call = BatchCall(method, params)
+        self.calls.append(call)
+        return call
+
+    def _executeChunk(self, chunk):
+        by_id = {call.id: call for call in chunk}
+        responses = self.send(json.dumps([call.request() for call in chunk]))
+        if isinstance(responses, dict):
+            # A single error object comes back when the whole batch is rejected
+            responses = [responses]
+        for response in responses:
+            call = by_id.pop(response.get("id"), None)
+            if call is None:
+                if "error" in response:
+                    for call in by_id.values():
+                        call.error = RPCError(call.method, response["error"])
+                        call.done = True
+                    by_id = {}
+                continue
+            if "error" in response:
+                call.error = RPCError(call.method, response["error"])
+            else:
+                call.result = response.get("result")
+            call.done = True
+        for call in by_id.values():
+            call.error = RPCError(call.method, {"message": "No response for this call"})
+            call.done = True
+
+    def execute(self):
+        calls, self.calls = self.calls, []
+        for start in range(0, len(calls), self.batch_size):
+            self._executeChunk(calls[start:start + self.batch_size])
+        return calls
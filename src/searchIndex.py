@@ -0,0 +1,144 @@
+"""
+Type-ahead search over project names, task titles or category names.
+
+  index = SearchIndex((project["id"], project["name"]) for project in projects)
+  index.search("zil")      -> ids of "Zillow", "Acme Zillow Inc", then "Zilow"
+
+search() ranks names starting with the query first, then names with a word
+starting with it, then fuzzy matches: names sharing most of the query's
+trigrams, which catches typos and text from the middle of a word. Matching
+ignores case and punctuation.
+
+The prefix part is a trie flattened into sorted lists of (text, key): the
+names that start with a prefix are one bisect away and sit next to each
+other, at a fraction of the memory of a node per character. add() and
+remove() keep the index current one item at a time, update() adds many at
+once. Keys are ids of one kind (all ints or all strings).
+"""
+from bisect import bisect_left, insort
+from collections import defaultdict
+import re
+
+WORD = re.compile(r"\w+")
+
+# Word-start suffixes are indexed up to this many characters, longer
+# queries are checked against the name itself
+SUFFIX_CHARS = 32
+
+# Fuzzy matches must share at least this fraction of the query's trigrams
+MIN_SIMILARITY = 0.5
+
+
+def normalize(text):
+    return " ".join(WORD.findall(str(text).casefold()))
+
+
+def trigrams(text):
+    padded = f" {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, items=()):
+        self._texts = {}  # key -> normalized name
+        self._names = []  # sorted (name, key)
+        self._words = []  # sorted (name from its second, third... word on, key)
+        self._grams = defaultdict(set)  # trigram -> keys
+        self.update(items)
+
+    def __len__(self):
+        return len(self._texts)
+
+    def __contains__(self, key):
+        return key in self._texts
+
+    def _entries(self, key, text):
+        # (name entry, word entries) of a normalized name
+        words = text.split(" ")
+        entries = []
+        start = 0
+        for word in words[:-1]:
+            start += len(word) + 1
+            entries.append((text[start:start + SUFFIX_CHARS], key))
+        return (text[:SUFFIX_CHARS], key), entries
+
+    def update(self, items):
+        # Bulk add: one sort instead of an insort per item
+        grams = self._grams
+        for key, text in items:
+            if key in self._texts:
+                self.remove(key)
+            text = self._texts[key] = normalize(text)
+            name, words = self._entries(key, text)
+            self._names.append(name)
+            self._words.extend(words)
+            for gram in trigrams(text):
+                grams[gram].add(key)
+        self._names.sort()
+        self._words.sort()
+
+    def add(self, key, text):
+        if key in self._texts:
+            self.remove(key)
+        text = self._texts[key] = normalize(text)
+        name, words = self._entries(key, text)
+        insort(self._names, name)
+        for entry in words:
+            insort(self._words, entry)
+        for gram in trigrams(text):
+            self._grams[gram].add(key)
+
+    def remove(self, key):
+        text = self._texts.pop(key, None)
+        if text is None:
+            return
+        name, words = self._entries(key, text)
+        for entries, entry in [(self._names, name)] + [(self._words, entry) for entry in words]:
+            position = bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+        for gram in trigrams(text):
+            keys = self._grams.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._grams[gram]
+
+    def _prefixed(self, entries, query, found, limit):
+        # Keys of entries starting with query, in name order
+        position = bisect_left(entries, (query[:SUFFIX_CHARS],))
+        while position < len(entries) and (limit is None or len(found) < limit):
+            suffix, key = entries[position]
+            if not suffix.startswith(query[:SUFFIX_CHARS]):
+                break
+            if key not in found and (len(query) <= SUFFIX_CHARS or query in self._texts[key]):
+                found[key] = None
+            position += 1
+
+    def search(self, query, limit=20):
+        # Keys of the best matches, best first; limit None returns them all
+        query = normalize(query)
+        if not query:
+            return []
+        found = {}  # insertion ordered set
+        self._prefixed(self._names, query, found, limit)
+        self._prefixed(self._words, query, found, limit)
+        if limit is not None and len(found) >= limit:
+            return list(found)
+
+        wanted = trigrams(query)
+        if len(query) < 3 or not wanted:
+            return list(found)
+        shared = {}
+        for gram in wanted:
+            for key in self._grams.get(gram, ()):
+                shared[key] = shared.get(key, 0) + 1
+        needed = MIN_SIMILARITY * len(wanted)
+        fuzzy = [(count, key) for key, count in shared.items() if count >= needed and key not in found]
+        # Most shared trigrams first, then the shorter name
+        fuzzy.sort(key=lambda match: (-match[0], len(self._texts[match[1]])))
+        for count, key in fuzzy:
+            if limit is not None and len(found) >= limit:
+                break
+            found[key] = None
+        return list(found)
@@ -0,0 +1,177 @@
+"""
+Task queries compiled to Kanboard's searchTasks filter language.
+
+  query = TaskQuery(title="Zillow", status="all")
+  matches = query.matcher()
+  tasks = [task for task in searchTasks(project_id, query.search()) if matches(task)]
+
+Kanboard does the filtering wherever its filters can say it, so a selective
+query transfers a handful of tasks instead of the whole project. Every task
+that comes back is checked again here, exactly, so the same query gives the
+same tasks from getAllTasks or the mirror:
+
+  title      exact title           -> title:"..." (Kanboard matches titles containing it)
+  pattern    title with * and ?    -> title:"<longest part without wildcards>"
+  contains   text in the title     -> title:"..."
+  status     "open", "closed" or "all" (default "open")
+                                   -> status:open, status:closed, nothing for all
+  category   category name         -> category:"...", checked by category_id
+  tag        tag name              -> tag:"...", checked with tagged()
+  column     column name           -> column:"...", checked by column_id
+  created, modified, due
+             (operator, when), operator one of >= > <= < and when a timestamp
+             or datetime.date      -> modified:>=2024-01-31, a day wider for the
+                                      server's timezone, the exact time is checked here
+  predicate  any other check of the task dict, here only
+
+Task rows carry ids, not names: matcher() needs the project's categories
+and columns as {name: id} for a query on them, and rows that pass it go
+through tagged() with their tags for a query on a tag. Names compare
+without case, like Kanboard's filters. Titles with a double quote in them
+cannot be written as a filter and are only checked here; such category,
+column and tag names raise ValueError. A query with nothing to push down
+has an empty search() and is best answered from getAllTasks of statusIds().
+"""
+import datetime
+import fnmatch
+import re
+
+WILDCARDS = re.compile(r"[*?]|\[[^\]]*\]")
+
+DATE_FIELDS = {"created": "date_creation", "modified": "date_modification", "due": "date_due"}
+
+OPERATORS = {
+    ">=": lambda value, when: value >= when,
+    ">": lambda value, when: value > when,
+    "<=": lambda value, when: value <= when,
+    "<": lambda value, when: value < when,
+}
+
+
+def _int(value):
+    if value is None or value == "":
+        return 0
+    return int(value)
+
+
+def titleMatcher(title):
+    # Exact title, or a case-insensitive pattern when it has * ? or [...]
+    if any(char in title for char in "*?["):
+        pattern = title.lower()
+        return lambda value: fnmatch.fnmatchcase(value.lower(), pattern)
+    return lambda value: value == title
+
+
+def _quoted(name, value):
+    return f'{name}:"{value}"' if value and '"' not in value else None
+
+
+def _timestamp(when):
+    if isinstance(when, datetime.datetime):
+        return int(when.timestamp())
+    if isinstance(when, datetime.date):
+        return int(datetime.datetime(when.year, when.month, when.day, tzinfo=datetime.timezone.utc).timestamp())
+    return int(when)
+
+
+def _dateFilter(name, operator, timestamp):
+    # Days are in the server's timezone, widen by one so no match is lost
+    day = datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).date()
+    if operator in (">=", ">"):
+        return f"{name}:>={day - datetime.timedelta(days=1)}"
+    return f"{name}:<={day + datetime.timedelta(days=1)}"
+
+
+class TaskQuery:
+    def __init__(self, title=None, pattern=None, contains=None, status="open", category=None, tag=None,
+                 column=None, created=None, modified=None, due=None, predicate=None):
+        if status not in ("open", "closed", "all"):
+            raise ValueError(f"status must be open, closed or all, not {status!r}")
+        for name, condition in (("created", created), ("modified", modified), ("due", due)):
+            if condition is not None and condition[0] not in OPERATORS:
+                raise ValueError(f"{name}: operator must be one of {', '.join(OPERATORS)}")
+        for name, value in (("category", category), ("column", column), ("tag", tag)):
+            if value is not None and _quoted(name, value) is None:
+                raise ValueError(f"{name} names with a double quote cannot be searched for")
+        self.title = title
+        self.pattern = pattern
+        self.contains = contains
+        self.status = status
+        self.category = category
+        self.tag = tag
+        self.column = column
+        self.dates = {name: condition for name, condition in (("created", created), ("modified", modified), ("due", due))
+                      if condition is not None}
+        self.predicate = predicate
+
+    def statusIds(self):
+        # getAllTasks status_id values covering the query
+        return {"open": [1], "closed": [0], "all": [1, 0]}[self.status]
+
+    def search(self):
+        # searchTasks query, "" when only the status would be in it
+        terms = []
+        if self.title is not None:
+            terms.append(_quoted("title", self.title))
+        if self.pattern is not None:
+            terms.append(_quoted("title", max(WILDCARDS.split(self.pattern), key=len)))
+        if self.contains is not None:
+            terms.append(_quoted("title", self.contains))
+        for name, value in (("category", self.category), ("column", self.column), ("tag", self.tag)):
+            if value is not None:
+                terms.append(_quoted(name, value))
+        for name, (operator, when) in self.dates.items():
+            terms.append(_dateFilter(name, operator, _timestamp(when)))
+        terms = [term for term in terms if term is not None]
+        if not terms:
+            return ""  # getAllTasks does a status alone already
+        if self.status != "all":
+            terms.append("status:" + self.status)
+        return " ".join(terms)
+
+    def matcher(self, categories=None, columns=None):
+        """
+        Check of one task row, everything but the tag.
+        categories, columns: {name: id} of the project, required when the
+        query has a category or column (ValueError otherwise)
+        """
+        checks = []
+        if self.title is not None:
+            checks.append(lambda task, title=self.title: task["title"] == title)
+        if self.pattern is not None:
+            matches = titleMatcher(self.pattern)
+            checks.append(lambda task: matches(task["title"]))
+        if self.contains is not None:
+            text = self.contains.lower()
+            checks.append(lambda task: text in task["title"].lower())
+        if self.status != "all":
+            active = 1 if self.status == "open" else 0
+            checks.append(lambda task: _int(task.get("is_active", 1)) == active)
+        for name, value, ids, key in (("category", self.category, categories, "category_id"),
+                                      ("column", self.column, columns, "column_id")):
+            if value is None:
+                continue
+            if ids is None:
+                raise ValueError(f"a query on a {name} needs the project's {name} ids")
+            # No such name in the project, no task matches
+            wanted = {str(name).casefold(): _int(item_id) for name, item_id in ids.items()}.get(value.casefold())
+            checks.append(lambda task, key=key, wanted=wanted: wanted is not None and _int(task.get(key)) == wanted)
+        for name, (operator, when) in self.dates.items():
+            timestamp = _timestamp(when)
+            field, compare = DATE_FIELDS[name], OPERATORS[operator]
+            if name == "due":
+                checks.append(lambda task, field=field, compare=compare, timestamp=timestamp:
+                              _int(task.get(field)) > 0 and compare(_int(task.get(field)), timestamp))
+            else:
+                checks.append(lambda task, field=field, compare=compare, timestamp=timestamp:
+                              compare(_int(task.get(field)), timestamp))
+        if self.predicate is not None:
+            checks.append(self.predicate)
+        return lambda task: all(check(task) for check in checks)
+
+    def tagged(self, tasks, tags):
+        # The tasks with the query's tag; tags: {task_id: [tag names]}
+        if self.tag is None:
+            return list(tasks)
+        wanted = self.tag.casefold()
+        return [task for task in tasks if wanted in (name.casefold() for name in tags.get(_int(task["id"]), ()))]
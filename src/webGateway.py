@@ -0,0 +1,314 @@
+"""
+Web gateway: the Kanboard API for internal users, behind one shared cache.
+
+  python src/newCompany.py -m web --port 8080
+
+Clients talk to the gateway instead of Kanboard:
+
+  POST /jsonrpc.php        Kanboard's JSON-RPC protocol, batches included, so
+                           this client works with KB_SITE=http://gateway:8080
+  GET  /api/<method>?...   one read (get*, search*) with the query string as
+                           params, the result (or error) as JSON, for
+                           dashboards; writes only go through /jsonrpc.php
+  GET  /stats              cache hits, misses, coalesced and upstream calls
+  POST /webhook?token=...  Kanboard's webhook events, see webhooks.py
+
+Reads (get*, search*) go through a read-through cache keyed by method and
+params. While a read is on its way upstream, identical reads wait for it
+instead of sending their own (singleflight), so 50 dashboards asking for
+one project's tasks cost one getAllTasks. Writes are passed through and
+then drop the cached reads of the project they touched (everything when
+the project is not known); a read that was in
+flight during the write is not stored. getTaskByName and getCategoryByName
+are answered from the cached getAllTasks/getAllCategories. Webhook events
+drop the cached reads of their project the same way, so changes made
+directly in Kanboard show up before --web_ttl runs out.
+
+With KB_GATEWAY_TOKEN set, clients must send "Authorization: Basic <token>";
+without it the gateway should only listen on localhost (the default).
+Kanboard cannot send that header, so /webhook checks KB_WEBHOOK_TOKEN instead.
+"""
+import asyncio
+import hmac
+import json
+import time
+import urllib.parse
+from collections import OrderedDict
+
+from compression import compressBody, decoder
+from rateLimit import isReadOnly
+from rpcBatch import RPCError
+from webhooks import checkToken, parseEvent
+
+COMPRESS_MIN = 1024
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 405: "Method Not Allowed",
+           500: "Internal Server Error", 502: "Bad Gateway"}
+
+
+def cacheKey(method, params):
+    return method + " " + json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+class ReadThroughCache:
+    """
+    ttl: seconds a read result is served from memory, 0 only coalesces
+    max_entries: least recently used results are dropped beyond this
+
+    Entries carry the project they belong to, so a write can drop just that
+    project. Reads whose project is not known (getAllProjects, getTask of a
+    task not seen yet) are site-wide and dropped by every write.
+    """
+
+    def __init__(self, ttl=60, max_entries=2000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires, project_id, value)
+        self._inflight = {}  # key -> Future of the upstream read
+        self._generations = {}  # project_id -> invalidations so far
+        self._flushes = 0
+        self.stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0}
+
+    def _generation(self, project_id):
+        return self._flushes, self._generations.get(project_id, 0)
+
+    async def get(self, key, project_id, load):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[2]
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(future)
+
+        self.stats["misses"] += 1
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        generation = self._generation(project_id)
+        try:
+            value = await load()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as error:
+            future.set_exception(error)
+            future.exception()  # no waiters is fine, do not log it as lost
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            self._inflight.pop(key, None)
+        # A write to the project while we were waiting makes this stale
+        if self.ttl > 0 and generation == self._generation(project_id):
+            self._entries[key] = (time.monotonic() + self.ttl, project_id, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, project_id=None):
+        # The project's and the site-wide reads, project_id None drops everything
+        self.stats["invalidations"] += 1
+        if project_id is None:
+            self._flushes += 1
+            self._entries.clear()
+            return
+        for owner in (project_id, None):
+            self._generations[owner] = self._generations.get(owner, 0) + 1
+        for key, (expires, owner, value) in list(self._entries.items()):
+            if owner in (project_id, None):
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def _queryParams(query):
+    # ?project_id=1&status_id=1 -> {"project_id": 1, "status_id": 1}
+    params = {}
+    for name, value in urllib.parse.parse_qsl(query):
+        params[name] = int(value) if value.lstrip("-").isdigit() else value
+    return params or None
+
+
+class Gateway:
+    """
+    client: an asyncClient.AsyncKanboardClient, bounds the upstream calls
+    cache: a ReadThroughCache
+    token: required "Authorization: Basic <token>", None to accept anyone
+    webhooks: webhooks.WebhookReceiver for the events on /webhook, or None
+    webhook_token: required ?token= on /webhook, None to accept anyone
+    """
+
+    def __init__(self, client, cache, token=None, webhooks=None, webhook_token=None):
+        self.client = client
+        self.cache = cache
+        self.token = token
+        self.webhooks = webhooks
+        self.webhook_token = webhook_token
+        self.task_projects = {}  # task id -> project id, seen in cached reads
+        self.upstream = 0
+
+    def projectOf(self, method, params):
+        params = params if isinstance(params, dict) else {}
+        if "project_id" in params:
+            return str(params["project_id"])
+        task_id = params.get("task_id", params.get("id") if "Task" in method else None)
+        return self.task_projects.get(str(task_id)) if task_id is not None else None
+
+    def _remember(self, result):
+        tasks = result if isinstance(result, list) else [result]
+        for task in tasks:
+            if isinstance(task, dict) and "title" in task and "project_id" in task and "id" in task:
+                self.task_projects[str(task["id"])] = str(task["project_id"])
+
+    async def _upstream(self, method, params):
+        self.upstream += 1
+        return await self.client.call(method, params)
+
+    async def _read(self, method, params):
+        project_id = self.projectOf(method, params)
+        result = await self.cache.get(cacheKey(method, params), project_id, lambda: self._upstream(method, params))
+        self._remember(result)
+        return result
+
+    async def call(self, method, params=None):
+        if method == "getTaskByName":
+            name = params.get("task_name", params.get("title"))
+            tasks = await self._read("getAllTasks", {"project_id": params["project_id"], "status_id": params.get("status_id", 1)})
+            return [task for task in tasks or [] if task["title"] == name]
+        if method == "getCategoryByName":
+            name = params.get("category_name", params.get("name"))
+            categories = await self._read("getAllCategories", {"project_id": params["project_id"]})
+            return next((category for category in categories or [] if category["name"] == name), None)
+        if isReadOnly([method]):
+            return await self._read(method, params)
+
+        project_id = self.projectOf(method, params)
+        try:
+            return await self._upstream(method, params)
+        finally:
+            # Even a failed write may have changed something
+            self.cache.invalidate(project_id)
+
+    async def answer(self, request):
+        # (JSON-RPC response, True when Kanboard could not be reached)
+        request_id = request.get("id") if isinstance(request, dict) else None
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32600, "message": "Invalid Request"}}, False
+        try:
+            result = await self.call(request["method"], request.get("params"))
+        except RPCError as error:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": error.code, "message": str(error), "data": error.data}}, False
+        except (KeyError, TypeError, AttributeError) as error:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32602, "message": f"Invalid params: {error}"}}, False
+        except Exception as error:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32000, "message": f"Upstream: {error}"}}, True
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}, False
+
+    def webhook(self, event):
+        # A task moved to another project is stale in both
+        moved_from = self.task_projects.get(str(event.task_id))
+        project_id = str(event.project_id) if event.project_id is not None else moved_from
+        if event.task_id is not None and project_id is not None:
+            self.task_projects[str(event.task_id)] = project_id
+        self.cache.invalidate(project_id)
+        if moved_from is not None and moved_from != project_id:
+            self.cache.invalidate(moved_from)
+        if self.webhooks is not None:
+            self.webhooks.apply(event)
+
+    async def route(self, verb, target, headers, body):
+        # (HTTP status, JSON payload)
+        path, _, query = target.partition("?")
+        if verb == "POST" and path == "/webhook":
+            if not checkToken(target, self.webhook_token):
+                return 401, {"error": "Unauthorized"}
+            try:
+                event = parseEvent(body)
+            except ValueError as error:
+                return 400, {"error": str(error)}
+            try:
+                self.webhook(event)
+            except Exception as error:
+                return 500, {"error": f"{event.name} not applied: {error}"}
+            return 200, {"applied": event.name}
+        if self.token is not None and not hmac.compare_digest(
+                headers.get("authorization", "").encode(), ("Basic " + self.token).encode()):
+            return 401, {"error": "Unauthorized"}
+        if path.endswith("/jsonrpc.php"):
+            try:
+                request = json.loads(body)
+            except ValueError:
+                return 200, {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}
+            if isinstance(request, list):
+                answers = await asyncio.gather(*(self.answer(item) for item in request))
+                return 200, [response for response, failed in answers]
+            response, failed = await self.answer(request)
+            # 502 lets clients retry reads as they would against Kanboard
+            return (502 if failed else 200), response
+        if verb == "GET" and path.startswith("/api/"):
+            method = path[len("/api/"):]
+            # A link or an <img> must not be able to change anything
+            if not isReadOnly([method]):
+                return 405, {"error": f"{method} changes data, send it to /jsonrpc.php"}
+            response, failed = await self.answer({"jsonrpc": "2.0", "id": 1, "method": method,
+                                                  "params": _queryParams(query)})
+            if "error" in response:
+                return (502 if failed else 400), {"error": response["error"]}
+            return 200, response["result"]
+        if verb == "GET" and path == "/stats":
+            return 200, dict(self.cache.stats, entries=len(self.cache), upstream=self.upstream)
+        return 404, {"error": "Not found"}
+
+    async def handle(self, reader, writer):
+        # One keep-alive HTTP/1.1 connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                try:
+                    verb, target, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Bad request"}, {}, close=True)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length") or 0))
+                inflater = decoder(headers.get("content-encoding"))
+                if inflater is not None:
+                    body = inflater.decompress(body) + inflater.flush()
+                status, payload = await self.route(verb, target, headers, body)
+                close = headers.get("connection", "").lower() == "close"
+                await self._respond(writer, status, payload, headers, close)
+                if close:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, headers, close=False):
+        data = json.dumps(payload).encode()
+        extra = {}
+        if "gzip" in headers.get("accept-encoding", ""):
+            data, extra = compressBody(data, COMPRESS_MIN)
+        head = [f"HTTP/1.1 {status} {REASONS.get(status, 'OK')}", "Content-Type: application/json",
+                f"Content-Length: {len(data)}", "Connection: " + ("close" if close else "keep-alive")]
+        head += [f"{name}: {value}" for name, value in extra.items()]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+        await writer.drain()
+
+
+async def serveGateway(client, host="127.0.0.1", port=8080, ttl=60, token=None, webhooks=None, webhook_token=None):
+    gateway = Gateway(client, ReadThroughCache(ttl), token, webhooks, webhook_token)
+    server = await asyncio.start_server(gateway.handle, host, port)
+    print(f"  Gateway listening on http://{host}:{server.sockets[0].getsockname()[1]}")
+    async with server, client:
+        await server.serve_forever()
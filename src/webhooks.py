@@ -0,0 +1,195 @@
+"""
+Kanboard webhook receiver: keep caches and the mirror current without polling.
+
+Kanboard posts an event to the URL under Settings > Webhooks for every task
+change, with the webhook token of that page appended as ?token=...:
+
+  {"event_name": "task.update", "event_author": "admin",
+   "event_data": {"task_id": 7, "task": {...the full task...}, "changes": {...}}}
+
+  python src/newCompany.py -m webhook --port 8081 --mirror kanboard.db
+  python src/newCompany.py -m daemon --webhook --port 8081     (into the daemon's caches)
+
+and the -m web gateway takes them on POST /webhook. Set the webhook URL in
+Kanboard to http://<this host>:8081/webhook and KB_WEBHOOK_TOKEN to its token.
+
+WebhookReceiver.apply() folds one event into the indexes it was given. Task
+events (created, updated, moved, closed, opened, and comment, subtask and
+file events, which carry the task too) write the task into the mirror and
+the LookupCache, where closed tasks are dropped as it only holds active
+ones. Category and project events, which plugins may send, drop the
+project's cached categories or the cached project list. Kanboard sends
+nothing when a task is removed: our own removeTask calls and a full sync
+(-m sync --full) take care of those.
+
+A task event that names no project is answered 400, one that fails to
+apply 500, and neither is counted in the stats.
+"""
+import hmac
+import json
+import threading
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from lookupCache import CATEGORIES, TASKS
+
+
+def _intOrNone(value):
+    if value is None or value == "":
+        return None
+    return int(value)
+
+
+class WebhookEvent:
+    def __init__(self, name, project_id=None, task_id=None, task=None, data=None):
+        self.name = name
+        self.project_id = project_id
+        self.task_id = task_id
+        self.task = task
+        self.data = data or {}
+
+
+def parseEvent(body):
+    # Raises ValueError on anything that is not a Kanboard webhook payload
+    payload = json.loads(body)
+    if not isinstance(payload, dict) or not isinstance(payload.get("event_name"), str):
+        raise ValueError("not a Kanboard webhook event")
+    data = payload.get("event_data")
+    data = data if isinstance(data, dict) else {}
+    task = data.get("task") if isinstance(data.get("task"), dict) else None
+    task_id = _intOrNone(data.get("task_id", (task or {}).get("id")))
+    project_id = _intOrNone(data.get("project_id", (task or {}).get("project_id")))
+    if task is not None and project_id is None and payload["event_name"] != "task.remove":
+        raise ValueError("task event without a project_id")
+    return WebhookEvent(payload["event_name"], project_id, task_id, task, data)
+
+
+def checkToken(target, token):
+    # True when ?token= of the request target matches, or no token is set
+    if not token:
+        return True
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(target).query)
+    return hmac.compare_digest(query.get("token", [""])[0].encode(), token.encode())
+
+
+class WebhookReceiver:
+    """
+    cache: LookupCache of this process, or None
+    mirror: Mirror, or None
+    response_cache: ResponseCache, or None
+    """
+
+    def __init__(self, cache=None, mirror=None, response_cache=None):
+        self.cache = cache
+        self.mirror = mirror
+        self.response_cache = response_cache
+        self.stats = {"events": 0, "tasks": 0, "removed": 0, "invalidated": 0, "ignored": 0}
+        self._lock = threading.Lock()
+
+    def apply(self, event):
+        # Counted once applied, a failing event raises and is left out of stats
+        with self._lock:
+            if event.name == "task.remove" and event.task_id is not None:
+                self._removeTask(event.task_id)
+            elif event.task is not None and event.task_id is not None:
+                task = dict(event.task)
+                task.setdefault("id", event.task_id)
+                if task.get("project_id") in (None, ""):
+                    if event.project_id is None:
+                        raise ValueError("task event without a project_id")
+                    task["project_id"] = event.project_id
+                self._putTask(task)
+            elif event.name.startswith("task.") and event.task_id is not None:
+                # No task record to apply, refetch the project's tasks
+                self._invalidate(TASKS, event.project_id)
+            elif event.name.startswith("category."):
+                category = event.data.get("category")
+                if self.mirror is not None and isinstance(category, dict) and "name" in category:
+                    self.mirror.putCategory(dict(category, project_id=category.get("project_id", event.project_id)))
+                self._invalidate(CATEGORIES, event.project_id)
+                if self.response_cache is not None and event.project_id is not None:
+                    self.response_cache.invalidate("getAllCategories", {"project_id": event.project_id})
+            elif event.name.startswith("project."):
+                if self.response_cache is not None:
+                    self.response_cache.invalidate("getAllProjects")
+                self.stats["invalidated"] += 1
+            else:
+                self.stats["ignored"] += 1
+            self.stats["events"] += 1
+
+    def _putTask(self, task):
+        if self.mirror is not None:
+            self.mirror.putTask(task)
+        if self.cache is not None:
+            # Moves between projects and closes leave the old entry behind otherwise
+            self.cache.remove(TASKS, task["id"])
+            if str(task.get("is_active", 1)) == "1":
+                self.cache.add(TASKS, task["project_id"], task)
+        self.stats["tasks"] += 1
+
+    def _removeTask(self, task_id):
+        if self.mirror is not None:
+            self.mirror.removeTask(task_id)
+        if self.cache is not None:
+            self.cache.remove(TASKS, task_id)
+        self.stats["removed"] += 1
+
+    def _invalidate(self, kind, project_id):
+        if self.cache is not None:
+            self.cache.invalidate(kind, project_id)
+        self.stats["invalidated"] += 1
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.partition("?")[0] == "/stats":
+            self._reply(200, self.server.receiver.stats)
+        else:
+            self._reply(404, {"error": "Not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.partition("?")[0] != "/webhook":
+            self._reply(404, {"error": "Not found"})
+        elif not checkToken(self.path, self.server.token):
+            self._reply(401, {"error": "Unauthorized"})
+        else:
+            try:
+                event = parseEvent(body)
+            except ValueError as error:
+                self._reply(400, {"error": str(error)})
+                return
+            try:
+                self.server.receiver.apply(event)
+            except Exception as error:
+                # Kanboard does not retry, the next full sync catches up
+                self._reply(500, {"error": f"{event.name} not applied: {error}"})
+                return
+            self._reply(200, {"applied": event.name})
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    Receives POST /webhook?token=... and serves GET /stats. Run it with
+    serve_forever(), in a thread of its own next to other work.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, receiver, host="127.0.0.1", port=8081, token=None):
+        super().__init__((host, port), _Handler)
+        self.receiver = receiver
+        self.token = token